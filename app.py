@@ -1,17 +1,14 @@
 import base64
 import io
-import cv2
-from flask import Flask, jsonify, redirect, render_template, request, send_file, url_for
+import json
+from flask import Flask, Response, jsonify, render_template, request, send_file, url_for
 import os
-from matplotlib import pyplot as plt
-import numpy as np
-from torch import device
-import torch
-from kolam.style_transfer import load_image, run_style_transfer, tensor_to_pil
-from main import generate_kolam_image, weave_styles
-from kolam.analysis import analyze_and_plot_kolam, analyze_kolam_full_phone, classify_kolam_density, extract_features_density
-
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+from main import iter_kolam_vector, scene_cache_stats, weave_styles
+from kolam.fractal import FractalBudgetError
+from kolam.analysis_cache import analysis_cache
+from kolam.style_cache import style_cache
+from kolam.style_jobs import DONE, FINISHED, QueueFull, style_jobs
+from kolam.render_cache import VECTOR_FORMATS, normalize_render_params, render_cache, render_cached, render_key
 
 app = Flask(__name__)
 app.secret_key = os.getenv("SECRET_KEY", "super-secret-key")
@@ -50,9 +47,11 @@ def generate_kolam():
     turns = int(request.form.get("turns", 6))
     layers = int(request.form.get("layers", 5))
     petals = int(request.form.get("petals", 8))
+    backend = request.form.get("backend", "matplotlib")
+    cell_px = int(request.form.get("cell_px", 40))
+    output_format = request.form.get("format", "png").lower()
 
-    # ✅ Call your function
-    buf = generate_kolam_image(
+    params = normalize_render_params(dict(
         pattern=pattern,
         rows=rows, cols=cols,
         n_petals=n_petals, rings=rings,
@@ -61,11 +60,41 @@ def generate_kolam():
         line_color=line_color, dot_color=dot_color, bg_color=bg_color,
         line_width=line_width, weave_style=weave_style,
         fractal_depth=fractal_depth, ring_scale=ring_scale,
-        turns=turns, layers=layers, petals=petals
-    )
+        turns=turns, layers=layers, petals=petals,
+        backend=backend, cell_px=cell_px, output_format=output_format
+    ))
+    key = render_key(params)
+
+    # Same parameters -> same bytes, so a matching ETag needs no render at all
+    if request.if_none_match.contains(key):
+        response = Response(status=304)
+        response.set_etag(key)
+        return response
+
+    try:
+        # Vector formats are streamed straight from the geometry, never buffered or cached
+        if output_format in VECTOR_FORMATS:
+            mimetype = "image/svg+xml" if output_format == "svg" else "application/pdf"
+            response = Response(iter_kolam_vector(**params), mimetype=mimetype)
+            response.set_etag(key)
+            return response
+
+        # ✅ Call your function (through the render cache)
+        data = render_cached(params, key)
+    except FractalBudgetError as exc:
+        # Refused before any geometry is generated
+        return jsonify({"error": str(exc)}), 400
+
+    response = send_file(io.BytesIO(data), mimetype="image/png", etag=False)
+    response.set_etag(key)
+    return response
+
+@app.route("/cache_stats")
+def cache_stats():
+    return jsonify({"render": render_cache.stats(), "scene": scene_cache_stats(),
+                    "analysis": analysis_cache.stats(), "style": style_cache.stats(),
+                    "style_jobs": style_jobs.stats()})
 
-    return send_file(buf, mimetype="image/png")
-    # return redirect(url_for(kolam))
 
 @app.route("/principles")
 def principles():
@@ -83,64 +112,21 @@ def analyse():
     if not file:
         return jsonify({"error": "No file uploaded"}), 400
 
-    # Save temporarily
-    image_path = "temp_kolam.jpg"
-    file.save(image_path)
-
-    # 1️⃣ Left pane: analyzed image using analyze_and_plot_kolam
-    dots_left, skeleton_left = analyze_and_plot_kolam(
-        image_path, dot_size=5, skeleton_marker_size=1, skeleton_color='gray'
-    )
-    # Convert the matplotlib figure from analyze_and_plot_kolam to base64
-    buf_left = io.BytesIO()
-    fig, ax = plt.subplots(figsize=(8,8))
-    gray_img = cv2.cvtColor(cv2.imread(image_path), cv2.COLOR_BGR2GRAY)
-    ax.imshow(gray_img, cmap='gray')
-    coords = np.column_stack(np.where(skeleton_left))
-    ax.plot(coords[:,1], coords[:,0], '.', color='gray', markersize=1)
-    for x, y in dots_left:
-        ax.plot(x, y, 'ko', markersize=5)
-    ax.axis('off')
-    plt.tight_layout()
-    fig.savefig(buf_left, format='png', bbox_inches='tight', pad_inches=0)
-    plt.close(fig)
-    buf_left.seek(0)
-    analyzed_base64 = base64.b64encode(buf_left.read()).decode("utf-8")
-
-    # 2️⃣ Right pane: analysis images from analyze_kolam_full_phone
-    gray, edges, contours, skeleton, dots = analyze_kolam_full_phone(image_path)
-    features = extract_features_density(gray, skeleton, dots, contours=contours)
-    kolam_class = classify_kolam_density(features)
-
-    def to_base64(img_array, cmap=None, dots_overlay=None):
-        buf = io.BytesIO()
-        fig, ax = plt.subplots(figsize=(4,4))
-        if cmap:
-            ax.imshow(img_array, cmap=cmap)
-        else:
-            ax.imshow(img_array)
-        if dots_overlay:
-            for x, y in dots_overlay:
-                ax.plot(x, y, 'ro', markersize=5)
-        ax.axis('off')
-        plt.tight_layout()
-        fig.savefig(buf, format='png', bbox_inches='tight', pad_inches=0)
-        plt.close(fig)
-        buf.seek(0)
-        return base64.b64encode(buf.read()).decode("utf-8")
-
-    dots_base64 = to_base64(gray, cmap='gray', dots_overlay=dots)
-    contours_base64 = to_base64(contours, cmap='gray')
-    edges_base64 = to_base64(edges, cmap='gray')
-    skeleton_base64 = to_base64(skeleton, cmap='gray')
+    # Decoded in memory straight from the upload; repeat and re-encoded
+    # uploads are answered from the analysis cache
+    result, status = analysis_cache.analyse(file.read())
+    previews = {name: base64.b64encode(png).decode("utf-8") for name, png in result["previews"].items()}
 
     return jsonify({
-        "analyzed_kolam": analyzed_base64,  # left pane
-        "dots": dots_base64,                # right gen1
-        "contours": contours_base64,        # right gen2
-        "edges": edges_base64,              # right gen3
-        "skeleton": skeleton_base64,         # right gen4
-        "classification": kolam_class
+        "analyzed_kolam": previews["analyzed_kolam"],  # left pane
+        "dots": previews["dots"],                      # right gen1
+        "contours": previews["contours"],              # right gen2
+        "edges": previews["edges"],                    # right gen3
+        "skeleton": previews["skeleton"],              # right gen4
+        "classification": result["classification"],
+        "features": result["features"],
+        "cache": status,
+        "timings": result["timings"],
     })
 
 
@@ -152,26 +138,70 @@ def styles():
 @app.route("/stylize", methods=["POST"])
 def stylize():
     content_file = request.files.get("content")
-    style_path = request.form.get("style")  # local path
-
-    if not content_file or not style_path:
-        return jsonify({"error": "Missing content or style"}), 400
-
-    # Save uploaded image temporarily
-    content_path = "temp_content.jpg"
-    content_file.save(content_path)
+    style_file = request.files.get("style")      # custom upload
+    style_path = request.form.get("style")       # or a gallery path
 
-    content = load_image(content_path, size=512).to(device)
-    style = load_image(style_path, size=512).to(device)
+    # "auto": a trained feed-forward network for the style if there is one, else optimization
+    engine = request.form.get("engine", "auto")
 
-    output = run_style_transfer(content, style, num_steps=200)
-    output_img = tensor_to_pil(output)
-
-    buf = io.BytesIO()
-    output_img.save(buf, format="JPEG")
-    buf.seek(0)
-
-    return send_file(buf, mimetype="image/jpeg")
+    if not content_file or not (style_file or style_path):
+        return jsonify({"error": "Missing content or style"}), 400
+    if engine not in ("auto", "optimize"):
+        return jsonify({"error": f"Unknown engine: {engine}"}), 400
+
+    # Runs in a worker process; the client follows it by polling or SSE
+    try:
+        job_id = style_jobs.submit(content_file.read(), style_file.read() if style_file else style_path,
+                                   size=512, num_steps=200, engine=engine)
+    except QueueFull as exc:
+        return jsonify({"error": str(exc)}), 503
+    return jsonify({
+        "job": job_id,
+        "status_url": url_for("stylize_status", job_id=job_id),
+        "events_url": url_for("stylize_events", job_id=job_id),
+        "result_url": url_for("stylize_result", job_id=job_id),
+    }), 202
+
+
+@app.route("/stylize/<job_id>")
+def stylize_status(job_id):
+    job = style_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(job)
+
+
+@app.route("/stylize/<job_id>/events")
+def stylize_events(job_id):
+    if style_jobs.get(job_id) is None:
+        return jsonify({"error": "Unknown job"}), 404
+
+    def events():
+        rev = -1
+        while True:
+            job = style_jobs.wait(job_id, rev)
+            if job is None:
+                return
+            if job["rev"] == rev:
+                yield ": keep-alive\n\n"
+                continue
+            rev = job["rev"]
+            yield f"data: {json.dumps(job)}\n\n"
+            if job["status"] in FINISHED:
+                return
+
+    return Response(events(), mimetype="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@app.route("/stylize/<job_id>/result")
+def stylize_result(job_id):
+    job = style_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    if job["status"] != DONE:
+        return jsonify({"error": job["error"] or "Job not finished", "status": job["status"]}), 409
+    return send_file(io.BytesIO(style_jobs.result(job_id)), mimetype="image/jpeg",
+                     download_name="kolam_stylized.jpg")
 
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
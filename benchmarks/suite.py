@@ -0,0 +1,237 @@
+"""
+Benchmark suite for the generation, analysis and style-transfer hot paths.
+
+Cases:
+    generate/<pattern>                  generate_kolam_image, default parameters
+    generate/weave/<style>/<n>x<n>      every weave_styles entry at each grid size
+    analyse/<image>                     the /analyse pipeline (KolamAnalysis + previews)
+                                        on each image in data/Testing
+    style_step/<size>                   one step of run_style_transfer (loss model
+                                        forward + backward) at each size
+
+Each case records its best wall time over --repeat runs, its peak RSS
+(process high-water mark, reset before the case where Linux allows it) and
+the size of its output. Results go to a JSON file; with --baseline, every
+case is compared against a saved run and the exit status is 1 when any
+regresses past the thresholds.
+
+Style transfer uses seeded random VGG weights (KOLAM_VGG_WEIGHTS=random),
+so the suite runs offline and style timings do not depend on the weights.
+
+Usage:
+    python benchmarks/suite.py [--groups generate analyse style] [--out results.json]
+    python benchmarks/suite.py --baseline benchmarks/baseline.json [--time-threshold 0.25]
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# Set before kolam.style_transfer is imported: no pretrained download
+os.environ.setdefault("KOLAM_VGG_WEIGHTS", "random")
+
+from main import _cached_scene, generate_kolam_image
+from kolam.features import iter_images
+from kolam.scene import SHAPE_PARAMS
+from kolam.weave import weave_styles
+
+GROUPS = ("generate", "analyse", "style")
+ANALYSE_DIR = os.path.join(ROOT, "data", "Testing")
+STYLE_IMAGE = os.path.join(ROOT, "static", "styles", "geometry 3.jpg")
+CONTENT_IMAGE = os.path.join(ROOT, "1.jpeg")
+
+
+# ---------------- Measurement ----------------
+def _reset_peak_rss():
+    """
+    Reset the RSS high-water mark (Linux >= 4.0); False where that is not possible.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _status_mb(field):
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+
+
+def _peak_rss_mb():
+    peak = _status_mb("VmHWM")
+    if peak is not None:
+        return peak
+    # ru_maxrss: kilobytes on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def measure(fn, repeat):
+    """
+    Best wall seconds, peak RSS (and its growth over the RSS at the start,
+    where known) and output bytes of fn(), which returns its output size in
+    bytes (or None).
+    """
+    reset = _reset_peak_rss()
+    start = _status_mb("VmRSS")
+    best, size = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        size = fn()
+        best = min(best, time.perf_counter() - t0)
+    peak = _peak_rss_mb()
+    return {"wall_s": round(best, 4), "peak_rss_mb": round(peak, 1), "peak_rss_reset": reset,
+            "rss_growth_mb": round(peak - start, 1) if reset and start is not None else None,
+            "output_bytes": size}
+
+
+# ---------------- Cases ----------------
+def generate_cases(grid_sizes):
+    def render(**params):
+        def run():
+            _cached_scene.cache_clear()          # time the geometry too, not only the render
+            return len(generate_kolam_image(**params).getvalue())
+        return run
+
+    for pattern in SHAPE_PARAMS:
+        if pattern != "weave":
+            yield f"generate/{pattern}", render(pattern=pattern)
+    for style in weave_styles:
+        for n in grid_sizes:
+            yield f"generate/weave/{style}/{n}x{n}", render(pattern="weave", rows=n, cols=n,
+                                                           weave_style=style)
+
+
+def analyse_cases(image_dir):
+    from kolam.analysis import KolamAnalysis
+    from kolam.analysis_cache import build_result
+
+    def analyse(data):
+        def run():
+            result = build_result(KolamAnalysis(data))
+            return sum(len(png) for png in result["previews"].values())
+        return run
+
+    for path in iter_images(image_dir):
+        with open(path, "rb") as f:
+            yield f"analyse/{os.path.relpath(path, image_dir)}", analyse(f.read())
+
+
+def style_cases(sizes):
+    import torch
+    from kolam.style_transfer import get_style_model_and_losses, load_image, vgg_features
+
+    vgg_features()                                     # load once, outside the timings
+
+    def step(size):
+        content = load_image(CONTENT_IMAGE, size=size)
+        style = load_image(STYLE_IMAGE, size=size)
+        model, style_losses, content_losses = get_style_model_and_losses(None, style, content)
+        input_img = content.clone().requires_grad_()
+
+        def run():
+            input_img.grad = None
+            model(input_img)
+            loss = sum(sl.loss for sl in style_losses) * 1e6 + sum(cl.loss for cl in content_losses)
+            loss.backward()
+            return None
+        return run
+
+    torch.manual_seed(0)
+    for size in sizes:
+        yield f"style_step/{size}", step(size)
+
+
+# ---------------- Baseline ----------------
+def compare(results, baseline, time_threshold, rss_threshold, size_threshold):
+    """
+    Regressions of results against baseline: (case, metric, old, new) for
+    every shared case whose wall time or peak RSS grew by more than its
+    threshold (a fraction), or whose output size changed by more than
+    size_threshold either way.
+    """
+    regressions = []
+    for case, new in results.items():
+        old = baseline.get(case)
+        if old is None:
+            continue
+        if new["wall_s"] > old["wall_s"] * (1 + time_threshold):
+            regressions.append((case, "wall_s", old["wall_s"], new["wall_s"]))
+        if new["peak_rss_reset"] and old.get("peak_rss_reset") and \
+                new["peak_rss_mb"] > old["peak_rss_mb"] * (1 + rss_threshold):
+            regressions.append((case, "peak_rss_mb", old["peak_rss_mb"], new["peak_rss_mb"]))
+        if new["output_bytes"] and old.get("output_bytes") and \
+                abs(new["output_bytes"] - old["output_bytes"]) > old["output_bytes"] * size_threshold:
+            regressions.append((case, "output_bytes", old["output_bytes"], new["output_bytes"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--groups", nargs="+", choices=GROUPS, default=list(GROUPS))
+    parser.add_argument("--grid-sizes", type=int, nargs="+", default=[9, 25, 50])
+    parser.add_argument("--style-sizes", type=int, nargs="+", default=[128, 256, 512])
+    parser.add_argument("--images", default=ANALYSE_DIR, help="images for the analyse cases")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--filter", help="only cases whose name contains this")
+    parser.add_argument("--out", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="earlier results to compare against")
+    parser.add_argument("--time-threshold", type=float, default=0.25,
+                        help="allowed relative wall-time growth")
+    parser.add_argument("--rss-threshold", type=float, default=0.25,
+                        help="allowed relative peak-RSS growth")
+    parser.add_argument("--size-threshold", type=float, default=0.10,
+                        help="allowed relative output-size change")
+    args = parser.parse_args()
+
+    makers = {
+        "generate": lambda: generate_cases(args.grid_sizes),
+        "analyse": lambda: analyse_cases(args.images),
+        "style": lambda: style_cases(args.style_sizes),
+    }
+    results = {}
+    for group in args.groups:
+        for case, fn in makers[group]():
+            if args.filter and args.filter not in case:
+                continue
+            results[case] = dict(measure(fn, args.repeat), group=group)
+            r = results[case]
+            size = f"{r['output_bytes']:>10}" if r["output_bytes"] else f"{'-':>10}"
+            print(f"{case:<44} {r['wall_s']:9.4f}s {r['peak_rss_mb']:9.1f} MB {size}")
+
+    report = {
+        "meta": {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+                 "platform": platform.platform(), "cpus": os.cpu_count(), "repeat": args.repeat,
+                 "vgg_weights": os.environ["KOLAM_VGG_WEIGHTS"]},
+        "results": results,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"wrote {args.out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.time_threshold, args.rss_threshold,
+                              args.size_threshold)
+        for case, metric, old, new in regressions:
+            print(f"REGRESSION {case}: {metric} {old} -> {new}")
+        print(f"{len(regressions)} regressions in {len(set(results) & set(baseline))} compared cases")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
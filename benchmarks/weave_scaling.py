@@ -0,0 +1,45 @@
+"""
+Time generate_kolam_image(pattern="weave") against grid size for both weave modes.
+
+Usage:
+    python benchmarks/weave_scaling.py [--sizes 10 25 50 100 200] [--patches-max 60]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import _cached_scene, generate_kolam_image
+
+
+def time_render(n, mode, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        _cached_scene.cache_clear()          # time the geometry too, not only the render
+        t0 = time.perf_counter()
+        generate_kolam_image(pattern="weave", rows=n, cols=n, weave_mode=mode)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 25, 50, 100, 150, 200])
+    parser.add_argument("--patches-max", type=int, default=60,
+                        help="largest grid to time in the per-patch mode (it is slow)")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'grid':>9} {'cells':>7} {'collection s':>13} {'ms/1k cells':>12} {'patches s':>10}")
+    for n in args.sizes:
+        cells = (n - 1) ** 2
+        t_coll = time_render(n, "collection", args.repeat)
+        t_patch = time_render(n, "patches", 1) if n <= args.patches_max else None
+        patch_col = f"{t_patch:10.3f}" if t_patch is not None else f"{'-':>10}"
+        print(f"{n:>4}x{n:<4} {cells:>7} {t_coll:13.3f} {1000 * t_coll / cells * 1000:12.2f} {patch_col}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,40 +3,26 @@ import numpy as np
 import matplotlib.pyplot as plt
 from skimage.morphology import skeletonize
 
-def analyze_and_plot_kolam(image_path, dot_size=5, skeleton_marker_size=1, skeleton_color='gray'):
+def analyze_and_plot_kolam(image_path, dot_size=5, skeleton_marker_size=1, skeleton_color='gray', plot=True):
     """
     Analyze a Kolam image and plot the dots and skeleton.
 
     Parameters:
-    - image_path: str, path to the Kolam image
+    - image_path: str path, upload bytes / file object, PIL image or BGR array
     - dot_size: int, size of the dots in the output plot
     - skeleton_marker_size: int, size of skeleton points in the output plot
     - skeleton_color: str or color, color for the skeleton points
+    - plot: bool, False returns the data without drawing anything
     """
     
-    # 1. Load image
-    image = cv2.imread(image_path)
-    if image is None:
-        raise FileNotFoundError(f"Image not found: {image_path}")
-    
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    
-    # 2. Threshold (invert if necessary)
-    _, binary = cv2.threshold(gray, 127, 255, cv2.THRESH_BINARY_INV)
-    
-    # 3. Skeletonize
-    skeleton = skeletonize(binary // 255)
-    
-    # 4. Detect dots (lenient settings)
-    params = cv2.SimpleBlobDetector_Params()
-    params.filterByArea = True
-    params.minArea = 2
-    params.maxArea = 1000
-    params.filterByCircularity = False
-    detector = cv2.SimpleBlobDetector_create(params)
-    keypoints = detector.detect(binary)
-    dots = [kp.pt for kp in keypoints]
+    # 1-4. Load, global threshold, skeletonize, detect dots (lenient settings)
+    analysis = KolamAnalysis(image_path, max_dim=None, threshold="global")
+    skeleton = analysis.skeleton
+    dots = analysis.dots
     
+    if not plot:
+        return dots, skeleton
+
     # 5. Plotting
     fig, ax = plt.subplots(figsize=(8,8))
     
@@ -52,6 +38,7 @@ def analyze_and_plot_kolam(image_path, dot_size=5, skeleton_marker_size=1, skele
     ax.invert_yaxis()
     ax.axis('off')
     plt.show()
+    plt.close(fig)     # nothing lingers when the backend is headless
     
     return dots, skeleton
 
@@ -62,7 +49,8 @@ import matplotlib.pyplot as plt
 from skimage.morphology import skeletonize
 from PIL import Image, ExifTags
 
-def analyze_kolam_full_phone(image_path, dot_size=5, skeleton_marker_size=1, skeleton_color='gray', max_dim=1024):
+def analyze_kolam_full_phone(image_path, dot_size=5, skeleton_marker_size=1, skeleton_color='gray', max_dim=1024,
+                             plot=True, tile=None, workers=None):
     """
     Analyze a Kolam image from phone photos, displaying all intermediate steps:
     - Grayscale
@@ -71,67 +59,21 @@ def analyze_kolam_full_phone(image_path, dot_size=5, skeleton_marker_size=1, ske
     - Skeleton
     - Detected dots
     Handles phone orientation, adaptive thresholding, and resizing.
+    image_path may also be upload bytes, a file object, a PIL image or a BGR array.
+    For full-resolution scans pass max_dim=None and a tile size (e.g. 1024):
+    thresholding, skeleton and dots then run tile by tile on `workers` processes.
+    With plot=False the intermediates are returned without drawing anything.
     """
-    # 1. Load image with PIL (for EXIF orientation)
-    img = Image.open(image_path)
-    
-    # 2. Correct orientation based on EXIF
-    try:
-        for orientation in ExifTags.TAGS.keys():
-            if ExifTags.TAGS[orientation]=='Orientation':
-                break
-        exif = img._getexif()
-        if exif is not None:
-            orientation_value = exif.get(orientation, None)
-            if orientation_value == 3:
-                img = img.rotate(180, expand=True)
-            elif orientation_value == 6:
-                img = img.rotate(270, expand=True)
-            elif orientation_value == 8:
-                img = img.rotate(90, expand=True)
-    except:
-        pass  # no EXIF orientation
-    
-    # 3. Convert to OpenCV format
-    image = cv2.cvtColor(np.array(img), cv2.COLOR_RGB2BGR)
-    
-    # 4. Resize if too large
-    h, w = image.shape[:2]
-    if max(h, w) > max_dim:
-        scale = max_dim / max(h, w)
-        image = cv2.resize(image, (int(w*scale), int(h*scale)))
-    
-    # 5. Grayscale
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    
-    # 6. Canny edges
-    edges = cv2.Canny(gray, 50, 150)
-    
-    # 7. Contours
-    contours, _ = cv2.findContours(edges.copy(), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    contour_img = np.zeros_like(gray)
-    cv2.drawContours(contour_img, contours, -1, 255, 1)
-    
-    # 8. Adaptive thresholding and skeletonization
-    binary = cv2.adaptiveThreshold(
-        gray, 255,
-        cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-        cv2.THRESH_BINARY_INV,
-        blockSize=11,
-        C=2
-    )
-    skeleton = skeletonize(binary // 255)
-    
-    # 9. Detect dots (lenient)
-    params = cv2.SimpleBlobDetector_Params()
-    params.filterByArea = True
-    params.minArea = 2
-    params.maxArea = 1000
-    params.filterByCircularity = False
-    detector = cv2.SimpleBlobDetector_create(params)
-    keypoints = detector.detect(binary)
-    dots = [kp.pt for kp in keypoints]
+    # 1-9. Orient, resize, grayscale, edges, contours, adaptive threshold,
+    #      skeleton and dots, each computed once by the staged pipeline
+    analysis = KolamAnalysis(image_path, max_dim=max_dim, threshold="adaptive",
+                             tile=tile, workers=workers)
+    gray, edges, contour_img = analysis.gray, analysis.edges, analysis.contour_img
+    skeleton, dots = analysis.skeleton, analysis.dots
     
+    if not plot:
+        return gray, edges, contour_img, skeleton, dots
+
     # 10. Plot results
     fig, axes = plt.subplots(2, 3, figsize=(15,10))
     
@@ -154,17 +96,24 @@ def analyze_kolam_full_phone(image_path, dot_size=5, skeleton_marker_size=1, ske
     
     plt.tight_layout()
     plt.show()
+    plt.close(fig)
     
     return gray, edges, contour_img, skeleton, dots
 
 # Example usage:
 # gray, edges, contours, skeleton, dots = analyze_kolam_full_phone("phone_photo.jpg")
-from scipy.spatial import distance
+from kolam.dots import dot_stats
+from kolam.skeleton_graph import graph_features, skeleton_graph
 import numpy as np
 
-def extract_features_density(gray, skeleton, dots, contours):
+# Bump whenever extract_features_density changes what it returns, so stored
+# features (kolam.features) are re-extracted
+FEATURES_VERSION = 3
+
+def extract_features_density(gray, skeleton, dots, contours, graph=None):
     """
     Extract density-based features for Kolam classification.
+    graph is the skeleton's stroke graph, built here if not given.
     """
     features = {}
     h, w = gray.shape
@@ -179,40 +128,205 @@ def extract_features_density(gray, skeleton, dots, contours):
     features['dot_density'] = len(dots) / area
     features['skeleton_density'] = np.sum(skeleton) / area
 
-    # Average distance between dots (optional)
-    if len(dots) > 1:
-        pts = np.array(dots)
-        dists = distance.pdist(pts)
-        features['avg_dot_distance'] = np.mean(dists)
-    else:
-        features['avg_dot_distance'] = 0
+    # Dot spacing and lattice (KD-tree; avg_dot_distance is sampled for huge dot counts)
+    features.update(dot_stats(dots))
+
+    # Stroke graph: closed loops, junctions, stroke lengths
+    features.update(graph_features(skeleton_graph(skeleton) if graph is None else graph))
+    features['loop_density'] = features['graph_loops'] / area
 
     return features
 
-def classify_kolam_density(features):
+# Thresholds (adjust based on your dataset)
+DENSITY_THRESHOLDS = {
+    "simple_dot_density": 0.0005,
+    "simple_skeleton_density": 0.002,
+    "geometric_dot_density": 0.002,
+    "geometric_skeleton_density": 0.01,
+    # Closed loops per pixel above which a kolam is looped. None leaves loops
+    # out of the rule: scans have tens to hundreds of noise loops per
+    # megapixel, so a value has to be fitted on labelled data first
+    "complex_loop_density": None,
+}
+
+def classify_kolam_density(features, thresholds=None):
     """
     Classify Kolam based on density features.
+
+    features is one image's feature dict, or columns of arrays (e.g. a
+    kolam.features store) to classify every row at once; thresholds
+    overrides entries of DENSITY_THRESHOLDS.
     """
-    dot_density = features['dot_density']
-    skeleton_density = features['skeleton_density']
-
-    # Thresholds (adjust based on your dataset)
-    if dot_density < 0.0005 and skeleton_density < 0.002:
-        return "Simple Dot-Based"
-    elif dot_density < 0.002 and skeleton_density < 0.01:
-        return "Geometric"
-    else:
-        return "Complex/Looped"
+    t = dict(DENSITY_THRESHOLDS, **(thresholds or {}))
+    dot_density = np.asarray(features['dot_density'])
+    skeleton_density = np.asarray(features['skeleton_density'])
+    few_loops = True if t["complex_loop_density"] is None else \
+        np.asarray(features.get('loop_density', 0)) < t["complex_loop_density"]
+
+    labels = np.select(
+        [(dot_density < t["simple_dot_density"]) & (skeleton_density < t["simple_skeleton_density"]) & few_loops,
+         (dot_density < t["geometric_dot_density"]) & (skeleton_density < t["geometric_skeleton_density"]) & few_loops],
+        ["Simple Dot-Based", "Geometric"], "Complex/Looped")
+    return str(labels) if labels.ndim == 0 else labels
     
 
-# Run your full analysis
-gray, edges, contour_img, skeleton, dots = analyze_kolam_full_phone("Kolam Generator.png")
+# ---------------- Staged pipeline ----------------
+import functools
+import time
+from kolam.ingest import decode_bgr
+
+
+def _blob_detector():
+    # Lenient settings shared by every dot-detection path
+    params = cv2.SimpleBlobDetector_Params()
+    params.filterByArea = True
+    params.minArea = 2
+    params.maxArea = 1000
+    params.filterByCircularity = False
+    return cv2.SimpleBlobDetector_create(params)
+
+
+def threshold_image(gray, threshold="adaptive"):
+    """
+    Binarize for skeletonization and dot detection (foreground 255):
+    "adaptive" (Gaussian, for photos) or "global" (fixed 127).
+    """
+    if threshold == "global":
+        _, binary = cv2.threshold(gray, 127, 255, cv2.THRESH_BINARY_INV)
+        return binary
+    return cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                 cv2.THRESH_BINARY_INV, blockSize=11, C=2)
+
+
+def _stage(func):
+    """
+    Turn a KolamAnalysis method into a lazy, computed-once attribute whose
+    own time (excluding the stages it pulls in) is recorded in .timings.
+    """
+    name = func.__name__
+
+    @functools.wraps(func)
+    def getter(self):
+        if name not in self._results:
+            self._child_ms.append(0.0)
+            t0 = time.perf_counter()
+            value = func(self)
+            total = (time.perf_counter() - t0) * 1000
+            children = self._child_ms.pop()
+            self.timings[name] = round(total - children, 3)
+            if self._child_ms:
+                self._child_ms[-1] += total
+            self._results[name] = value
+        return self._results[name]
+    return property(getter)
+
+
+class KolamAnalysis:
+    """
+    Analysis of one image in lazy stages:
+
+        image -> gray -> edges -> contours -> contour_img
+                      -> binary -> skeleton
+                                -> graph
+                                -> dots
+
+    Each stage runs at most once, the first time it (or a later stage) is
+    read, and its time in milliseconds lands in .timings.
+
+    - source:     image path, upload bytes / file object, PIL image or BGR
+                  array (decoded once, in memory, EXIF-oriented)
+    - max_dim:    longest side after resizing, or None to keep full size
+    - threshold:  "adaptive" (Gaussian, for photos) or "global" (fixed 127)
+    - tile:       if set, binary, skeleton and dots come from one "tiled"
+                  stage that splits the image into tile x tile pieces over
+                  a process pool (kolam.tiles); meant for max_dim=None scans
+    - workers:    processes for the tiled stage (default: all cores)
+    """
+    def __init__(self, source, max_dim=1024, threshold="adaptive", tile=None, workers=None):
+        self.source = source
+        self.max_dim = max_dim
+        self.threshold = threshold
+        self.tile = tile
+        self.workers = workers
+        self.timings = {}
+        self._results = {}
+        self._child_ms = []
+
+    @_stage
+    def image(self):
+        return decode_bgr(self.source, self.max_dim)
+
+    @_stage
+    def gray(self):
+        return cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY)
+
+    @_stage
+    def edges(self):
+        return cv2.Canny(self.gray, 50, 150)
+
+    @_stage
+    def contours(self):
+        contours, _ = cv2.findContours(self.edges.copy(), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        return contours
+
+    @_stage
+    def contour_img(self):
+        contour_img = np.zeros_like(self.gray)
+        cv2.drawContours(contour_img, self.contours, -1, 255, 1)
+        return contour_img
+
+    @_stage
+    def tiled(self):
+        from kolam.tiles import tiled_analysis
+        return tiled_analysis(self.gray, self.threshold, tile=self.tile, workers=self.workers)
+
+    @_stage
+    def binary(self):
+        if self.tile:
+            return self.tiled[0]
+        return threshold_image(self.gray, self.threshold)
+
+    @_stage
+    def skeleton(self):
+        if self.tile:
+            return self.tiled[1]
+        return skeletonize(self.binary // 255)
+
+    @_stage
+    def dots(self):
+        if self.tile:
+            return self.tiled[2]
+        return [kp.pt for kp in _blob_detector().detect(self.binary)]
+
+    @_stage
+    def graph(self):
+        return skeleton_graph(self.skeleton)
+
+    @_stage
+    def features(self):
+        return extract_features_density(self.gray, self.skeleton, self.dots,
+                                        contours=self.contour_img, graph=self.graph)
+
+    @_stage
+    def classification(self):
+        # Trained model when one is installed, density thresholds otherwise
+        from kolam.classifier import classify_kolam
+        return classify_kolam(self.features)
+
+    @property
+    def total_ms(self):
+        return round(sum(self.timings.values()), 3)
+
+
+if __name__ == "__main__":
+    # Run your full analysis
+    gray, edges, contour_img, skeleton, dots = analyze_kolam_full_phone("Kolam Generator.png")
 
-# Extract density features
-features = extract_features_density(gray, skeleton, dots, contours=contour_img)
+    # Extract density features
+    features = extract_features_density(gray, skeleton, dots, contours=contour_img)
 
-# Classify
-kolam_class = classify_kolam_density(features)
+    # Classify
+    kolam_class = classify_kolam_density(features)
 
-print("Kolam classification:", kolam_class)
-print("Feature details:", features)
\ No newline at end of file
+    print("Kolam classification:", kolam_class)
+    print("Feature details:", features)
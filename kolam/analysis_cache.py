@@ -0,0 +1,247 @@
+"""
+Result cache for /analyse.
+
+A result is what the analysis page shows for one upload: the dot centres,
+features, classification and the encoded preview PNGs. Results are stored
+in an LRUCache (memory tier plus optional disk tier) under two kinds of key:
+
+    exact       SHA-256 of the upload bytes and the analysis settings; a
+                byte-identical re-upload is answered without decoding.
+    perceptual  a 256-bit difference hash (dHash) of the analysed grayscale
+                image. A re-encoded or re-compressed copy of a photo decodes
+                to nearly the same pixels, so its dHash lands within a few
+                bits of the original's and the stored result is reused after
+                only the decode stage. Only images analysed at the same size
+                are compared, so dot coordinates and previews still line up.
+
+Line-art kolams on plain paper have so few gradients that dHash alone
+cannot tell two similar drawings from a re-encoded copy (distinct images in
+data/ come within 5 bits; JPEG re-encodes drift up to 16). dHash therefore
+only picks candidates, and a candidate is accepted when its 128x128
+thumbnail matches: at most NEAR_CHANGED of its pixels may differ by more
+than NEAR_PIXEL_DELTA gray levels (re-encodes: 0%, distinct images: >5%).
+
+The perceptual index lives in memory (the exact tier survives restarts via
+the disk directory). Hit rates of both are reported by stats().
+"""
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from kolam.analysis import FEATURES_VERSION, KolamAnalysis
+from kolam.cache import LRUCache
+from kolam.classifier import classifier_key
+from kolam.overlay import RED, encode_png, overlay_preview, to_canvas
+
+RESULT_VERSION = 2
+# dHash grid: DHASH_SIZE x DHASH_SIZE bits
+DHASH_SIZE = 16
+# Near-duplicate check on THUMB_SIZE x THUMB_SIZE thumbnails
+THUMB_SIZE = 128
+NEAR_PIXEL_DELTA = 16
+NEAR_CHANGED = 0.01
+PREVIEWS = ("analyzed_kolam", "dots", "contours", "edges", "skeleton")
+
+
+# ---------------- Results ----------------
+def build_result(analysis):
+    """
+    The /analyse result for a KolamAnalysis: preview PNG bytes by name plus
+    the compact outputs they were drawn from.
+    """
+    gray, skeleton, dots = analysis.gray, analysis.skeleton, analysis.dots
+    classification = analysis.classification
+    render_t0 = time.perf_counter()
+    previews = {
+        # Left pane: skeleton and dots over the grayscale image
+        "analyzed_kolam": overlay_preview(gray, skeleton=skeleton, dots=dots),
+        # Right pane: the pipeline's intermediate images
+        "dots": overlay_preview(gray, dots=dots, dot_color=RED),
+        "contours": (to_canvas(analysis.contour_img), None),
+        "edges": (to_canvas(analysis.edges), None),
+        "skeleton": (to_canvas(skeleton), None),
+    }
+    previews = {name: encode_png(*canvas) for name, canvas in previews.items()}
+    timings = dict(analysis.timings, render=round((time.perf_counter() - render_t0) * 1000, 3))
+    return {
+        "previews": previews,
+        "dots": [[float(x), float(y)] for x, y in dots],
+        "features": {k: float(v) for k, v in analysis.features.items()},
+        "classification": classification,
+        "shape": list(gray.shape),
+        "timings": timings,
+    }
+
+
+def encode_result(result):
+    """
+    Compact bytes for a result: PNGs stored as they are, dots as a float32
+    array, the rest as a JSON header.
+    """
+    header = {k: result[k] for k in ("features", "classification", "shape")}
+    header["version"] = RESULT_VERSION
+    arrays = {
+        "header": np.frombuffer(json.dumps(header).encode("utf-8"), dtype=np.uint8),
+        "dots": np.asarray(result["dots"], dtype=np.float32).reshape(-1, 2),
+    }
+    for name in PREVIEWS:
+        arrays["png_" + name] = np.frombuffer(result["previews"][name], dtype=np.uint8)
+    buf = io.BytesIO()
+    np.savez(buf, **arrays)           # PNGs are already compressed
+    return buf.getvalue()
+
+
+def decode_result(data):
+    """
+    Inverse of encode_result (None for a result from another version).
+    """
+    with np.load(io.BytesIO(data), allow_pickle=False) as npz:
+        header = json.loads(npz["header"].tobytes().decode("utf-8"))
+        if header.pop("version") != RESULT_VERSION:
+            return None
+        header["dots"] = npz["dots"].astype(float).tolist()
+        header["previews"] = {name: npz["png_" + name].tobytes() for name in PREVIEWS}
+    return header
+
+
+# ---------------- Keys ----------------
+def exact_key(data, settings):
+    h = hashlib.sha256(json.dumps(settings, sort_keys=True).encode("utf-8"))
+    h.update(data)
+    return h.hexdigest()
+
+
+def dhash(gray, size=DHASH_SIZE):
+    """
+    Difference hash: the sign of each horizontal gradient on a size x
+    (size + 1) thumbnail, as size*size packed bits.
+    """
+    thumb = cv2.resize(gray, (size + 1, size), interpolation=cv2.INTER_AREA).astype(np.int16)
+    return np.packbits(thumb[:, 1:] > thumb[:, :-1])
+
+
+def thumbnail(gray, size=THUMB_SIZE):
+    return cv2.resize(gray, (size, size), interpolation=cv2.INTER_AREA)
+
+
+# ---------------- Cache ----------------
+class AnalysisCache:
+    """
+    LRUCache of encoded results by exact key, plus an in-memory index of
+    dHashes and thumbnails (per analysed image size) for near-duplicate
+    lookups.
+
+    - max_distance: largest dHash Hamming distance for a near-duplicate
+                    candidate (0 disables near-duplicate matching)
+    - max_index:    images remembered for near-duplicate lookups
+                    (THUMB_SIZE**2 bytes each)
+    """
+    def __init__(self, max_bytes=32 * 1024 * 1024, disk_dir=None, disk_max_bytes=None,
+                 max_distance=32, max_index=1024):
+        self.store = LRUCache(max_bytes=max_bytes, disk_dir=disk_dir, disk_max_bytes=disk_max_bytes)
+        self.max_distance = max_distance
+        self.max_index = max_index
+        self._index = OrderedDict()       # exact key -> (settings+shape, packed dHash, thumbnail)
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.misses = 0
+
+    def _get(self, key):
+        data = self.store.get(key)
+        return decode_result(data) if data is not None else None
+
+    def _nearest(self, group, bits, thumb):
+        with self._lock:
+            items = [(k, h, t) for k, (g, h, t) in self._index.items() if g == group]
+        if not items:
+            return None
+        hashes = np.stack([h for _, h, _ in items])
+        distances = np.unpackbits(hashes ^ bits, axis=1).sum(axis=1)
+        candidates = np.flatnonzero(distances <= self.max_distance)
+        if not len(candidates):
+            return None
+        thumbs = np.stack([items[i][2] for i in candidates]).astype(np.int16)
+        changed = (np.abs(thumbs - thumb.astype(np.int16)) > NEAR_PIXEL_DELTA).mean(axis=(1, 2))
+        best = int(np.argmin(changed))
+        return items[candidates[best]][0] if changed[best] <= NEAR_CHANGED else None
+
+    def _remember(self, key, group, bits, thumb):
+        with self._lock:
+            self._index[key] = (group, bits, thumb)
+            self._index.move_to_end(key)
+            while len(self._index) > self.max_index:
+                self._index.popitem(last=False)
+
+    def analyse(self, data, max_dim=1024, threshold="adaptive"):
+        """
+        (result, status) for upload bytes; status is "exact", "near" or "miss".
+        """
+        t0 = time.perf_counter()
+        settings = {"max_dim": max_dim, "threshold": threshold, "classifier": classifier_key(),
+                    "features_version": FEATURES_VERSION, "result_version": RESULT_VERSION}
+        key = exact_key(data, settings)
+        result = self._get(key)
+        if result is not None:
+            with self._lock:
+                self.exact_hits += 1
+            result["timings"] = {"cache": round((time.perf_counter() - t0) * 1000, 3)}
+            return result, "exact"
+
+        analysis = KolamAnalysis(data, max_dim=max_dim, threshold=threshold)
+        gray = analysis.gray
+        group = json.dumps([settings, list(gray.shape)])
+        bits, thumb = dhash(gray), thumbnail(gray)
+        if self.max_distance:
+            near = self._nearest(group, bits, thumb)
+            result = self._get(near) if near else None
+            if result is not None:
+                with self._lock:
+                    self.near_hits += 1
+                result["timings"] = dict(analysis.timings,
+                                         cache=round((time.perf_counter() - t0) * 1000, 3))
+                return result, "near"
+
+        result = build_result(analysis)
+        self.store.put(key, encode_result(result))
+        self._remember(key, group, bits, thumb)
+        with self._lock:
+            self.misses += 1
+        return result, "miss"
+
+    def clear(self):
+        self.store.clear()
+        with self._lock:
+            self._index.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.exact_hits + self.near_hits + self.misses
+            stats = {
+                "lookups": lookups,
+                "exact_hits": self.exact_hits,
+                "near_hits": self.near_hits,
+                "misses": self.misses,
+                "hit_rate": (self.exact_hits + self.near_hits) / lookups if lookups else 0.0,
+                "indexed": len(self._index),
+                "max_distance": self.max_distance,
+            }
+        stats["store"] = self.store.stats()
+        return stats
+
+
+# One cache per process; sizes, disk tier and matching come from the environment
+analysis_cache = AnalysisCache(
+    max_bytes=int(os.getenv("KOLAM_ANALYSIS_CACHE_BYTES", 32 * 1024 * 1024)),
+    disk_dir=os.getenv("KOLAM_ANALYSIS_CACHE_DIR") or None,
+    disk_max_bytes=int(os.getenv("KOLAM_ANALYSIS_CACHE_DISK_BYTES", 0)) or None,
+    max_distance=int(os.getenv("KOLAM_ANALYSIS_NEAR_BITS", 32)),
+    max_index=int(os.getenv("KOLAM_ANALYSIS_NEAR_ENTRIES", 1024)),
+)
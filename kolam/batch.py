@@ -0,0 +1,201 @@
+"""
+Batch generation of kolam catalogues over a process pool.
+
+A sweep spec is JSON:
+
+    {
+      "base":  {"pattern": "weave", "dot_grid": true},
+      "sweep": {
+        "weave_style": "all",
+        "rows": [9, 15, 25],
+        "colors": [{"line_color": "black", "bg_color": "white"},
+                   {"line_color": "#b22222", "dot_color": "#b22222", "bg_color": "#fff8e7"}]
+      },
+      "format": "png"
+    }
+
+Every combination of the "sweep" axes is merged over "base". A list of
+objects sets several parameters per value, and "all" for weave_style
+expands to every registered style. Each item is rendered once into
+<out>/<key>.<ext> and recorded in <out>/manifest.jsonl. Items already in
+the manifest are skipped, so an interrupted sweep resumes where it stopped.
+
+Usage:
+    python -m kolam.batch spec.json --out catalogue/ [--workers N]
+"""
+import argparse
+import itertools
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from kolam.render_cache import normalize_render_params, render_key
+from main import generate_kolam_image, iter_kolam_vector, weave_styles
+
+MANIFEST = "manifest.jsonl"
+
+
+# ---------------- Sweep expansion ----------------
+def expand_sweep(spec):
+    """
+    Yield normalized parameter dicts for every combination in a sweep spec.
+    """
+    base = dict(spec.get("base", {}))
+    if "format" in spec:
+        base["output_format"] = spec["format"]
+
+    axes = []
+    for name, values in spec.get("sweep", {}).items():
+        if name == "weave_style" and values == "all":
+            values = list(weave_styles)
+        if not isinstance(values, list):
+            values = [values]
+        axes.append([v if isinstance(v, dict) else {name: v} for v in values])
+
+    for combo in itertools.product(*axes):
+        params = dict(base)
+        for part in combo:
+            params.update(part)
+        yield normalize_render_params(params)
+
+
+def read_manifest(out_dir):
+    """
+    Manifest records by key; a truncated last line from a crash is ignored.
+    """
+    done = {}
+    path = os.path.join(out_dir, MANIFEST)
+    if not os.path.exists(path):
+        return done
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if os.path.exists(os.path.join(out_dir, record["path"])):
+                done[record["key"]] = record
+    return done
+
+
+# ---------------- Workers ----------------
+_worker_fig = None
+
+
+def _init_worker():
+    # One figure per worker process, reused for every matplotlib render
+    global _worker_fig
+    import matplotlib.pyplot as plt
+    _worker_fig = plt.figure(figsize=(6, 6))
+
+
+def render_item(params, key, out_dir):
+    """
+    Render one sweep item to disk and return its manifest record.
+    """
+    ext = params.get("output_format", "png")
+    rel = f"{key}.{ext}"
+    path = os.path.join(out_dir, rel)
+    tmp = path + ".part"
+
+    t0 = time.perf_counter()
+    with open(tmp, "wb") as f:
+        if ext in ("svg", "pdf"):
+            for piece in iter_kolam_vector(**params):
+                f.write(piece.encode("utf-8") if isinstance(piece, str) else piece)
+        else:
+            fig = _worker_fig if params.get("backend", "matplotlib") == "matplotlib" else None
+            f.write(generate_kolam_image(fig=fig, **params).getvalue())
+    render_ms = (time.perf_counter() - t0) * 1000
+    os.replace(tmp, path)
+
+    return {"key": key, "params": params, "path": rel,
+            "render_ms": round(render_ms, 3), "bytes": os.path.getsize(path)}
+
+
+# ---------------- Driver ----------------
+def run_sweep(spec, out_dir, workers=None, max_pending=None, progress=None):
+    """
+    Render every item of a sweep spec into out_dir. Returns a summary dict.
+
+    Items whose key is already in the manifest (and whose file exists) are
+    skipped. Records are appended as items finish, so killing the run loses
+    at most the items in flight.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    done = read_manifest(out_dir)
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or workers * 4
+
+    todo, skipped = {}, set()
+    for params in expand_sweep(spec):
+        key = render_key(params)
+        if key in done:
+            skipped.add(key)                 # only this spec's keys: the manifest may hold other sweeps
+        else:
+            todo.setdefault(key, params)     # duplicate combinations render once
+
+    t0 = time.perf_counter()
+    rendered = 0
+    failed = []
+    items = iter(todo.items())
+    with open(os.path.join(out_dir, MANIFEST), "a") as manifest, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        pending = {}
+
+        def submit_more():
+            # Bounded in-flight window keeps huge sweeps from queueing everything at once
+            for key, params in itertools.islice(items, max_pending - len(pending)):
+                pending[pool.submit(render_item, params, key, out_dir)] = key
+
+        submit_more()
+        while pending:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                key = pending.pop(future)
+                try:
+                    record = future.result()
+                except Exception as exc:
+                    failed.append({"key": key, "error": repr(exc)})
+                    continue
+                manifest.write(json.dumps(record) + "\n")
+                manifest.flush()
+                rendered += 1
+                if progress:
+                    progress(rendered, len(todo), record)
+            submit_more()
+
+    elapsed = time.perf_counter() - t0
+    return {
+        "rendered": rendered,
+        "skipped": len(skipped),
+        "failed": failed,
+        "seconds": round(elapsed, 3),
+        "items_per_second": round(rendered / elapsed, 3) if elapsed > 0 else None,
+        "workers": workers,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render a kolam parameter sweep.")
+    parser.add_argument("spec", help="path to a JSON sweep spec")
+    parser.add_argument("--out", required=True, help="output directory (also holds the manifest)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--quiet", action="store_true")
+    args = parser.parse_args(argv)
+
+    with open(args.spec) as f:
+        spec = json.load(f)
+
+    def progress(n, total, record):
+        if not args.quiet:
+            print(f"[{n}/{total}] {record['path']} {record['render_ms']:.0f}ms {record['bytes']}B")
+
+    summary = run_sweep(spec, args.out, workers=args.workers, progress=progress)
+    print(json.dumps(summary, indent=2))
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
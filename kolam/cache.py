@@ -0,0 +1,147 @@
+"""
+Byte-budgeted LRU cache with an optional on-disk tier.
+
+Values are bytes. The memory tier evicts least-recently-used entries once
+its byte budget is exceeded; the disk tier (one file per key under a
+directory) survives restarts and is consulted on a memory miss, promoting
+hits back into memory.
+"""
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+TMP_SUFFIX = ".tmp"
+
+
+class LRUCache:
+    def __init__(self, max_bytes=64 * 1024 * 1024, disk_dir=None, disk_max_bytes=None):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    # ---------------- Disk tier ----------------
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[:2], key)
+
+    def _disk_get(self, key):
+        try:
+            with open(self._disk_path(key), "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        try:
+            os.utime(self._disk_path(key))     # mtime doubles as LRU clock for the disk tier
+        except OSError:
+            pass                               # trimmed by another process since the read
+        return data
+
+    def _disk_put(self, key, value):
+        path = self._disk_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=TMP_SUFFIX)
+        with os.fdopen(fd, "wb") as f:
+            f.write(value)
+        os.replace(tmp, path)              # atomic, so readers never see half a file
+        if self.disk_max_bytes:
+            self._disk_trim()
+
+    def _disk_trim(self):
+        files = []
+        for root, _, names in os.walk(self.disk_dir):
+            for name in names:
+                if name.endswith(TMP_SUFFIX):   # another writer's file, not yet in place
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                files.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    # ---------------- Memory tier ----------------
+    def _memory_put(self, key, value):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= len(old)
+        if len(value) > self.max_bytes:
+            return
+        self._entries[key] = value
+        self._bytes += len(value)
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+            self.evictions += 1
+
+    # ---------------- API ----------------
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                self.memory_hits += 1
+                return value
+        if self.disk_dir:
+            value = self._disk_get(key)
+            if value is not None:
+                with self._lock:
+                    self._memory_put(key, value)
+                    self.hits += 1
+                    self.disk_hits += 1
+                return value
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._memory_put(key, value)
+        if self.disk_dir:
+            self._disk_put(key, value)
+
+    def __contains__(self, key):
+        with self._lock:
+            if key in self._entries:
+                return True
+        return bool(self.disk_dir) and os.path.exists(self._disk_path(key))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "disk_dir": self.disk_dir,
+            }
@@ -0,0 +1,245 @@
+"""
+Trained kolam classifier: multinomial logistic regression in NumPy.
+
+A model is trained on a kolam.features store, one class per value of a
+label column (by default the images' parent directory, e.g.
+kolam_dataset/sikku and kolam_dataset/pulli). Features are sign-log
+compressed (counts and lengths span orders of magnitude), standardized,
+and fitted with L-BFGS on a class-balanced, L2-regularized softmax loss.
+
+Models are small versioned .npz files (a JSON header plus the weights).
+The app's model is loaded lazily, once per process, from
+KOLAM_CLASSIFIER_MODEL (default models/kolam_classifier.npz); without one,
+or with one trained on features of another FEATURES_VERSION, classify_kolam
+falls back to the density thresholds. Scoring is a single
+matrix product over every row, so re-labelling a whole store is one call.
+
+Usage:
+    python -m kolam.classifier train --store features.npz [--out models/kolam_classifier.npz]
+    python -m kolam.classifier relabel --store features.npz [--model ...]
+"""
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+import warnings
+from collections import Counter
+
+import numpy as np
+from scipy.optimize import minimize
+
+from kolam.analysis import FEATURES_VERSION, classify_kolam_density
+from kolam.features import feature_columns, load_store, n_rows, save_store
+
+MODEL_VERSION = 1
+DEFAULT_MODEL_PATH = os.getenv("KOLAM_CLASSIFIER_MODEL", os.path.join("models", "kolam_classifier.npz"))
+
+
+class StaleModelError(ValueError):
+    """
+    Raised for a model trained on features of another FEATURES_VERSION,
+    whose weights would score features with a different meaning.
+    """
+
+
+# ---------------- Model ----------------
+def _transform(X):
+    return np.sign(X) * np.log1p(np.abs(X))
+
+
+def feature_matrix(features, names):
+    """
+    (n, len(names)) float matrix from one feature dict (n = 1) or columns
+    of arrays. Missing features are NaN.
+    """
+    cols = [np.atleast_1d(np.asarray(features.get(name, np.nan), dtype=float)) for name in names]
+    n = max((len(c) for c in cols), default=0)
+    return np.column_stack([np.broadcast_to(c, (n,)) for c in cols]) if cols else np.empty((n, 0))
+
+
+def train_model(X, y, names, l2=1e-2, balanced=True, max_iter=500):
+    """
+    Fit a model dict on a feature matrix X (n, d) and string labels y (n,).
+    """
+    classes, yi = np.unique(np.asarray(y, dtype=str), return_inverse=True)
+    if len(classes) < 2:
+        raise ValueError(f"need at least two classes to train, got {list(classes)}")
+    Z = _transform(np.asarray(X, dtype=float))
+    mean = np.nanmean(Z, axis=0)
+    Z = np.where(np.isnan(Z), mean, Z)
+    scale = Z.std(axis=0)
+    scale[scale == 0] = 1.0
+    Z = (Z - mean) / scale
+
+    n, d = Z.shape
+    k = len(classes)
+    Y = np.eye(k)[yi]
+    counts = np.bincount(yi, minlength=k)
+    w = (n / (k * counts))[yi] if balanced else np.ones(n)
+    w = w / w.sum()
+
+    def loss(theta):
+        W, b = theta[:d * k].reshape(d, k), theta[d * k:]
+        logits = Z @ W + b
+        logits -= logits.max(axis=1, keepdims=True)
+        logp = logits - np.log(np.exp(logits).sum(axis=1, keepdims=True))
+        value = -(w * (Y * logp).sum(axis=1)).sum() + 0.5 * l2 * (W * W).sum()
+        G = (np.exp(logp) - Y) * w[:, None]
+        grad = np.concatenate([(Z.T @ G + l2 * W).ravel(), G.sum(axis=0)])
+        return value, grad
+
+    fit = minimize(loss, np.zeros(d * k + k), jac=True, method="L-BFGS-B",
+                   options={"maxiter": max_iter})
+    model = {
+        "classes": [str(c) for c in classes],
+        "features": list(names),
+        "mean": mean,
+        "scale": scale,
+        "weights": fit.x[:d * k].reshape(d, k),
+        "bias": fit.x[d * k:],
+        "info": {"samples": int(n), "class_counts": dict(zip(map(str, classes), map(int, counts))),
+                 "l2": l2, "balanced": balanced, "converged": bool(fit.success)},
+    }
+    model["info"]["train_accuracy"] = float(np.mean(predict(model, X) == classes[yi]))
+    return model
+
+
+def predict_proba(model, X):
+    """
+    Class probabilities (n, classes) for a feature matrix in model["features"] order.
+    """
+    Z = _transform(np.asarray(X, dtype=float))
+    Z = np.where(np.isnan(Z), model["mean"], Z)
+    logits = ((Z - model["mean"]) / model["scale"]) @ model["weights"] + model["bias"]
+    logits -= logits.max(axis=1, keepdims=True)
+    p = np.exp(logits)
+    return p / p.sum(axis=1, keepdims=True)
+
+
+def predict(model, X):
+    return np.asarray(model["classes"])[np.argmax(predict_proba(model, X), axis=1)]
+
+
+def model_key(model):
+    """
+    Short content hash, so caches can tell models apart.
+    """
+    h = hashlib.sha256(json.dumps([model["classes"], model["features"]]).encode("utf-8"))
+    for name in ("mean", "scale", "weights", "bias"):
+        h.update(np.ascontiguousarray(model[name], dtype=float).tobytes())
+    return h.hexdigest()[:16]
+
+
+# ---------------- Persistence ----------------
+def save_model(model, path):
+    header = {"version": MODEL_VERSION, "classes": model["classes"],
+              "features": model["features"], "info": model["info"]}
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".part"
+    with open(tmp, "wb") as f:
+        np.savez(f, header=np.frombuffer(json.dumps(header).encode("utf-8"), dtype=np.uint8),
+                 **{k: model[k] for k in ("mean", "scale", "weights", "bias")})
+    os.replace(tmp, path)
+
+
+def load_model(path):
+    with np.load(path, allow_pickle=False) as npz:
+        header = json.loads(npz["header"].tobytes().decode("utf-8"))
+        if header["version"] != MODEL_VERSION:
+            raise ValueError(f"unsupported classifier model version {header['version']}")
+        trained_on = header["info"].get("store_settings", {}).get("features_version")
+        if trained_on != FEATURES_VERSION:
+            raise StaleModelError(f"classifier model {path} was trained on features version "
+                                  f"{trained_on}, not {FEATURES_VERSION}; retrain it")
+        model = {k: npz[k] for k in ("mean", "scale", "weights", "bias")}
+    model.update(classes=header["classes"], features=header["features"], info=header["info"])
+    model["key"] = model_key(model)
+    return model
+
+
+_models = {}
+_models_lock = threading.Lock()
+
+
+def get_model(path=None):
+    """
+    The model at path (default DEFAULT_MODEL_PATH), loaded once per
+    process; None if there is no model file or it is stale.
+    """
+    path = path or DEFAULT_MODEL_PATH
+    with _models_lock:
+        if path not in _models:
+            try:
+                _models[path] = load_model(path) if os.path.exists(path) else None
+            except StaleModelError as exc:
+                warnings.warn(f"{exc}; classifying with the density thresholds")
+                _models[path] = None
+        return _models[path]
+
+
+def classifier_key(path=None):
+    """
+    Identifies what classify_kolam currently uses: a model hash or "thresholds".
+    """
+    model = get_model(path)
+    return model["key"] if model else "thresholds"
+
+
+def classify_kolam(features, model=None):
+    """
+    Classify one feature dict (-> str) or columns of arrays (-> array) with
+    the trained model, or the density thresholds when there is none.
+    """
+    model = model or get_model()
+    if model is None:
+        return classify_kolam_density(features)
+    labels = predict(model, feature_matrix(features, model["features"]))
+    single = all(np.ndim(v) == 0 for v in features.values())
+    return str(labels[0]) if single else labels
+
+
+# ---------------- CLI ----------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train or apply the kolam classifier.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    train = commands.add_parser("train", help="fit a model on a feature store")
+    train.add_argument("--store", required=True, help="feature store (.npz) from kolam.features")
+    train.add_argument("--out", default=DEFAULT_MODEL_PATH, help="model file to write")
+    train.add_argument("--label-column", default="label", help="store column holding the classes")
+    train.add_argument("--exclude", nargs="*", default=[], help="label values to leave out")
+    train.add_argument("--l2", type=float, default=1e-2)
+
+    relabel = commands.add_parser("relabel", help="classify every row of a store with a model")
+    relabel.add_argument("--store", required=True, help="feature store (.npz); gains a 'predicted' column")
+    relabel.add_argument("--model", default=DEFAULT_MODEL_PATH)
+    args = parser.parse_args(argv)
+
+    columns, settings = load_store(args.store)
+    features = feature_columns(columns)
+    if args.command == "train":
+        names = sorted(features)
+        y = columns[args.label_column].astype(str)
+        keep = ~np.isin(y, args.exclude)
+        X = feature_matrix(features, names)[keep]
+        model = train_model(X, y[keep], names, l2=args.l2)
+        model["info"]["store_settings"] = settings
+        save_model(model, args.out)
+        print(json.dumps({"model": args.out, "classes": model["classes"], **model["info"]}, indent=2))
+        return 0
+
+    model = load_model(args.model)
+    t0 = time.perf_counter()
+    predicted = classify_kolam(features, model) if n_rows(columns) else np.array([], dtype=str)
+    score_ms = (time.perf_counter() - t0) * 1000
+    columns["predicted"] = np.asarray(predicted, dtype=str)
+    save_store(args.store, columns, settings)
+    print(json.dumps({"rows": n_rows(columns), "classes": dict(Counter(map(str, predicted))),
+                      "score_ms": round(score_ms, 3)}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,113 @@
+"""
+Dot-lattice statistics from a KD-tree.
+
+Pulli kolams are drawn around a grid of dots, so what matters about the
+detected dots is the lattice they sit on: its pitch, how it is turned and
+how evenly it is filled. All of that comes from one scipy cKDTree built
+over the dot centres, with nearest-neighbour and fixed-radius queries in
+O(n log n), so thousands of noisy blobs from a phone photo stay cheap.
+
+The mean pairwise distance (the old avg_dot_distance feature) is exact up
+to MAX_EXACT_DOTS dots and estimated from random pairs beyond that,
+instead of materializing an O(n^2) distance matrix.
+"""
+import numpy as np
+from scipy.spatial import cKDTree, distance
+
+# Neighbours per dot used for spacing and lattice direction
+KNN = 4
+# Above this many dots avg_dot_distance is estimated from PAIR_SAMPLES random pairs
+MAX_EXACT_DOTS = 2000
+PAIR_SAMPLES = 200_000
+# Neighbour vectors within this factor of the nearest-neighbour spacing count as lattice steps
+PITCH_TOLERANCE = 0.25
+# Local density counts neighbours within this many pitches (covers the 8 neighbours of a square grid)
+DENSITY_RADIUS = 1.5
+# Histogram of neighbour counts: bins are [lo, hi) counts, the last one open-ended
+DENSITY_BINS = ((0, 1), (1, 3), (3, 5), (5, 7), (7, 9), (9, None))
+
+
+def _bin_name(lo, hi):
+    if hi is None:
+        return f"dot_nbrs_{lo}p"
+    return f"dot_nbrs_{lo}" if hi == lo + 1 else f"dot_nbrs_{lo}_{hi - 1}"
+
+
+FEATURE_NAMES = (
+    "avg_dot_distance", "dot_nn_mean", "dot_nn_median", "dot_nn_cv", "dot_knn_mean",
+    "lattice_pitch", "lattice_angle", "lattice_order", "local_density_mean",
+) + tuple(_bin_name(lo, hi) for lo, hi in DENSITY_BINS)
+
+
+def mean_pairwise_distance(pts, max_exact=MAX_EXACT_DOTS, samples=PAIR_SAMPLES, seed=0):
+    """
+    Mean distance over all pairs of points: exact for small inputs, else
+    an unbiased estimate from random distinct pairs (seeded, so repeatable).
+    """
+    n = len(pts)
+    if n < 2:
+        return 0.0
+    if n <= max_exact:
+        return float(np.mean(distance.pdist(pts)))
+    rng = np.random.default_rng(seed)
+    i = rng.integers(0, n, samples)
+    j = (i + rng.integers(1, n, samples)) % n        # never equal to i
+    return float(np.mean(np.hypot(*(pts[i] - pts[j]).T)))
+
+
+def lattice_direction(vectors):
+    """
+    (angle, order) of a set of lattice steps, folded modulo 90 degrees.
+
+    angle is in degrees in [-45, 45): 0 for an axis-aligned grid, -45 for a
+    diamond (diagonal) one. order in [0, 1] is how well the steps agree on
+    a square lattice (1 for a perfect grid, ~0 for scattered points).
+    """
+    if len(vectors) == 0:
+        return 0.0, 0.0
+    phi = np.arctan2(vectors[:, 1], vectors[:, 0])
+    mean = np.mean(np.exp(4j * phi))
+    angle = np.degrees(np.angle(mean) / 4)
+    return float((angle + 45) % 90 - 45), float(np.abs(mean))
+
+
+def dot_stats(dots, k=KNN):
+    """
+    Spacing, lattice and local-density features (FEATURE_NAMES) of a set of
+    (x, y) dot centres.
+    """
+    stats = dict.fromkeys(FEATURE_NAMES, 0.0)
+    pts = np.asarray(dots, dtype=float).reshape(-1, 2)
+    n = len(pts)
+    if n < 2:
+        return stats
+    stats["avg_dot_distance"] = mean_pairwise_distance(pts)
+
+    tree = cKDTree(pts)
+    k = min(k, n - 1)
+    dist, idx = tree.query(pts, k=k + 1)           # column 0 is the dot itself
+    dist, idx = dist[:, 1:], idx[:, 1:]
+    nn = dist[:, 0]
+    stats["dot_nn_mean"] = float(nn.mean())
+    stats["dot_nn_median"] = float(np.median(nn))
+    stats["dot_nn_cv"] = float(nn.std() / nn.mean()) if nn.mean() > 0 else 0.0
+    stats["dot_knn_mean"] = float(dist.mean())
+
+    # Lattice steps: neighbour vectors about one nearest-neighbour spacing long
+    base = stats["dot_nn_median"]
+    if base <= 0:
+        return stats
+    steps = (pts[idx] - pts[:, None, :]).reshape(-1, 2)
+    lengths = dist.ravel()
+    on_lattice = np.abs(lengths - base) <= PITCH_TOLERANCE * base
+    # An even count of nearest distances can put their median between two spacings, matching none
+    pitch = float(np.median(lengths[on_lattice])) if on_lattice.any() else base
+    stats["lattice_pitch"] = pitch
+    stats["lattice_angle"], stats["lattice_order"] = lattice_direction(steps[on_lattice])
+
+    counts = np.maximum(tree.query_ball_point(pts, DENSITY_RADIUS * pitch, return_length=True) - 1, 0)
+    stats["local_density_mean"] = float(counts.mean())
+    for lo, hi in DENSITY_BINS:
+        inside = counts >= lo if hi is None else (counts >= lo) & (counts < hi)
+        stats[_bin_name(lo, hi)] = float(np.mean(inside))
+    return stats
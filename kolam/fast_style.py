@@ -0,0 +1,262 @@
+"""
+Feed-forward style transfer: one small image-transformation network per
+style image.
+
+Optimization-based transfer (kolam.style_transfer) runs hundreds of VGG
+passes per image. Here that cost is paid once, offline: a compact
+encoder / residual / decoder network is trained on a corpus of kolam
+images to minimize the same perceptual loss, i.e. the ContentLoss and
+StyleLoss modules of get_style_model_and_losses around the shared VGG19,
+with the style's Gram targets from kolam.style_cache. Styling an image is
+then a single forward pass of that network.
+
+Models are saved as FAST_STYLE_DIR/<style hash>.pt, named after the
+SHA-256 of the style image's bytes, so a model is found for a style
+whatever its file name (uploaded styles included) and a changed gallery
+image no longer matches its old model.
+
+Usage:
+    python -m kolam.fast_style train --style "static/styles/geometry 3.jpg" [--content data/] [--steps 2000]
+    python -m kolam.fast_style train --all
+    python -m kolam.fast_style stylize --style "static/styles/geometry 3.jpg" input.jpg output.jpg
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+
+import torch
+import torch.nn as nn
+
+from kolam.features import iter_images
+from kolam.style_cache import gallery, style_targets
+from kolam.style_transfer import (device, get_style_model_and_losses, load_image, network_key,
+                                  tensor_to_pil, vgg_features)
+
+FAST_STYLE_VERSION = 1
+FAST_STYLE_DIR = os.getenv("KOLAM_FAST_STYLE_DIR", os.path.join("models", "fast_style"))
+# Encoder widths (full, 1/2 and 1/4 resolution) and residual blocks at 1/4
+DEFAULT_CONFIG = {"channels": [16, 32, 64], "residual_blocks": 3}
+
+
+# ---------------- Network ----------------
+def _conv(cin, cout, kernel, stride=1):
+    return nn.Sequential(
+        nn.ReflectionPad2d(kernel // 2),
+        nn.Conv2d(cin, cout, kernel, stride),
+        nn.InstanceNorm2d(cout, affine=True),
+        nn.ReLU(inplace=True),
+    )
+
+
+class ResidualBlock(nn.Module):
+    def __init__(self, channels):
+        super().__init__()
+        self.body = nn.Sequential(
+            _conv(channels, channels, 3),
+            nn.ReflectionPad2d(1),
+            nn.Conv2d(channels, channels, 3),
+            nn.InstanceNorm2d(channels, affine=True),
+        )
+
+    def forward(self, x):
+        return x + self.body(x)
+
+
+class TransformerNet(nn.Module):
+    """
+    Image -> styled image of the same size (a multiple of 4), both in the
+    normalized space of load_image. Upsampling is nearest-neighbour plus a
+    convolution, which avoids the checkerboard of transposed convolutions.
+    """
+    def __init__(self, channels=(16, 32, 64), residual_blocks=3):
+        super().__init__()
+        c1, c2, c3 = channels
+        self.encoder = nn.Sequential(_conv(3, c1, 5), _conv(c1, c2, 3, 2), _conv(c2, c3, 3, 2))
+        self.residual = nn.Sequential(*[ResidualBlock(c3) for _ in range(residual_blocks)])
+        self.decoder = nn.Sequential(
+            nn.Upsample(scale_factor=2, mode="nearest"), _conv(c3, c2, 3),
+            nn.Upsample(scale_factor=2, mode="nearest"), _conv(c2, c1, 3),
+            nn.ReflectionPad2d(2), nn.Conv2d(c1, 3, 5),
+        )
+
+    def forward(self, x):
+        return self.decoder(self.residual(self.encoder(x)))
+
+
+# ---------------- Models on disk ----------------
+def style_hash(data):
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+def _read(source):
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source)
+    with open(source, "rb") as f:
+        return f.read()
+
+
+def model_path(style, model_dir=None):
+    """
+    Where the model for a style image (path or bytes) is, or would be, saved.
+    """
+    return os.path.join(model_dir or FAST_STYLE_DIR, style_hash(_read(style)) + ".pt")
+
+
+def save_fast_model(net, path, config, info):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".part"
+    torch.save({"version": FAST_STYLE_VERSION, "config": config, "info": info,
+                "state_dict": net.state_dict()}, tmp)
+    os.replace(tmp, path)
+
+
+def load_fast_model(path):
+    checkpoint = torch.load(path, map_location="cpu", weights_only=True)
+    if checkpoint["version"] != FAST_STYLE_VERSION:
+        raise ValueError(f"unsupported fast style model version {checkpoint['version']}")
+    net = TransformerNet(**checkpoint["config"])
+    net.load_state_dict(checkpoint["state_dict"])
+    net = net.to(device).eval()
+    net.requires_grad_(False)
+    return net
+
+
+_models = {}
+_models_lock = threading.Lock()
+
+
+def get_fast_model(style, model_dir=None):
+    """
+    The trained network for a style image (path or bytes), loaded once per
+    process; None while there is no model for it.
+    """
+    path = model_path(style, model_dir)
+    with _models_lock:
+        if path not in _models:
+            if not os.path.exists(path):
+                return None
+            _models[path] = load_fast_model(path)
+        return _models[path]
+
+
+def stylize_fast(content_img, net):
+    """
+    Styled image for a load_image tensor: one forward pass.
+    """
+    with torch.inference_mode():
+        output = net(content_img.to(device))
+    if output.shape[-2:] != content_img.shape[-2:]:
+        output = nn.functional.interpolate(output, size=content_img.shape[-2:], mode="bilinear",
+                                           align_corners=False)
+    return output
+
+
+# ---------------- Training ----------------
+def train_fast_model(style, content_paths, steps=2000, size=256, batch_size=4, lr=1e-3,
+                     style_weight=1e6, content_weight=1, config=None, seed=0, log_every=50):
+    """
+    Train a TransformerNet for one style image (path or bytes) on content
+    images; returns (net, config, info).
+
+    Each step styles a random batch of content images and scores it with
+    the model of get_style_model_and_losses: content targets from the
+    batch itself, style targets from the Gram cache.
+    """
+    config = dict(config or DEFAULT_CONFIG)
+    if not content_paths:
+        raise ValueError("no content images to train on")
+    rng = random.Random(seed)
+    torch.manual_seed(seed)
+
+    grams, _ = style_targets(_read(style), size=size)
+    net = TransformerNet(**config).to(device).train()
+    optimizer = torch.optim.Adam(net.parameters(), lr=lr)
+    images = {}                       # decoded training images, by path
+
+    def batch():
+        paths = rng.sample(content_paths, min(batch_size, len(content_paths)))
+        for p in paths:
+            if p not in images:
+                images[p] = load_image(p, size=size)
+        return torch.cat([images[p] for p in paths]).to(device)
+
+    t0 = time.perf_counter()
+    for step in range(1, steps + 1):
+        content = batch()
+        model, style_losses, content_losses = get_style_model_and_losses(None, None, content, grams=grams)
+        optimizer.zero_grad()
+        model(net(content))
+        style_score = sum(sl.losses for sl in style_losses).mean()
+        content_score = sum(cl.losses for cl in content_losses).mean()
+        loss = style_score * style_weight + content_score * content_weight
+        loss.backward()
+        optimizer.step()
+        if step % log_every == 0 or step == steps:
+            print(f"Step {step} | Style: {style_score.item():.4f} | Content: {content_score.item():.4f}"
+                  f" | {time.perf_counter() - t0:.0f}s")
+
+    info = {"steps": steps, "size": size, "batch_size": batch_size, "lr": lr,
+            "style_weight": style_weight, "content_weight": content_weight,
+            "images": len(content_paths), "network": network_key(vgg_features()),
+            "style_loss": style_score.item(), "content_loss": content_score.item(),
+            "seconds": round(time.perf_counter() - t0, 1)}
+    return net.eval(), config, info
+
+
+# ---------------- CLI ----------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train or apply feed-forward style networks.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    train = commands.add_parser("train", help="train a network for one or every gallery style")
+    which = train.add_mutually_exclusive_group(required=True)
+    which.add_argument("--style", help="style image")
+    which.add_argument("--all", action="store_true", help="every image in static/styles")
+    train.add_argument("--content", default="data", help="directory of training (content) images")
+    train.add_argument("--out-dir", default=FAST_STYLE_DIR)
+    train.add_argument("--steps", type=int, default=2000)
+    train.add_argument("--size", type=int, default=256)
+    train.add_argument("--batch", type=int, default=4)
+    train.add_argument("--lr", type=float, default=1e-3)
+    train.add_argument("--style-weight", type=float, default=1e6)
+    train.add_argument("--content-weight", type=float, default=1)
+
+    apply = commands.add_parser("stylize", help="style one image with a trained network")
+    apply.add_argument("--style", required=True, help="style image the network was trained for")
+    apply.add_argument("--size", type=int, default=512)
+    apply.add_argument("--model-dir", default=FAST_STYLE_DIR)
+    apply.add_argument("input")
+    apply.add_argument("output")
+    args = parser.parse_args(argv)
+
+    if args.command == "stylize":
+        net = get_fast_model(args.style, args.model_dir)
+        if net is None:
+            parser.error(f"no model for {args.style} (expected {model_path(args.style, args.model_dir)})")
+        content = load_image(args.input, size=args.size)
+        t0 = time.perf_counter()
+        output = stylize_fast(content, net)
+        ms = (time.perf_counter() - t0) * 1000
+        tensor_to_pil(output).save(args.output)
+        print(json.dumps({"output": args.output, "forward_ms": round(ms, 1)}))
+        return 0
+
+    content_paths = list(iter_images(args.content))
+    for style in ([args.style] if args.style else gallery()):
+        net, config, info = train_fast_model(style, content_paths, steps=args.steps, size=args.size,
+                                             batch_size=args.batch, lr=args.lr,
+                                             style_weight=args.style_weight,
+                                             content_weight=args.content_weight)
+        info["style"] = style
+        path = model_path(style, args.out_dir)
+        save_fast_model(net, path, config, info)
+        print(json.dumps({"model": path, **info}))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,106 @@
+"""
+Iterative engine for the fractal-square kolam.
+
+The pattern is a square plus four half-size squares centred on the
+midpoints of its sides, repeated down to the requested depth. Instead of
+recursing per square, each level is generated in one step as NumPy arrays.
+Levels whose squares would be smaller than a pixel at the target
+resolution are skipped (every level below them is smaller still), squares
+that land on the same spot at that resolution are kept once, and the
+segment count is checked against a budget before anything is allocated.
+Vector output, which can be zoomed, passes pixel=0 to keep every level.
+"""
+import os
+
+import numpy as np
+
+from kolam.raster import AUTOSCALE_MARGIN, AXES_INCHES, DEFAULT_DPI
+
+# Upper bound on segments (4 per square) a single fractal may produce
+MAX_SEGMENTS = int(os.getenv("KOLAM_FRACTAL_MAX_SEGMENTS", 400_000))
+
+# Child centres relative to the parent centre, in parent half-sizes
+_CHILD_OFFSETS = np.array([[1, 0], [-1, 0], [0, 1], [0, -1]], dtype=float)
+# Closed square outline in half-sizes
+_OUTLINE = np.array([[-1, -1], [1, -1], [1, 1], [-1, 1], [-1, -1]], dtype=float)
+
+
+class FractalBudgetError(ValueError):
+    """
+    Raised when a fractal needs more segments than the budget allows.
+    """
+
+
+def fractal_extent(depth=4, size=1.0):
+    """
+    Half-width of the full pattern: size * (2 - 2**-depth).
+    """
+    return size * (2 - 0.5 ** depth)
+
+
+def fractal_pixel_size(depth=4, size=1.0, dpi=DEFAULT_DPI):
+    """
+    Data units per output pixel for the default 6in figure at dpi.
+    """
+    span = 2 * fractal_extent(depth, size) * (1 + 2 * AUTOSCALE_MARGIN)
+    return span / (AXES_INCHES * dpi)
+
+
+def fractal_levels(depth=4, size=1.0, pixel=None, min_px=1.0):
+    """
+    How many levels (0..depth) are drawn: a level stops the descent once
+    its squares are less than min_px pixels across.
+    """
+    pixel = fractal_pixel_size(depth, size) if pixel is None else pixel
+    levels, s = 0, abs(size)
+    while levels <= depth and (pixel <= 0 or 2 * s >= min_px * pixel):
+        levels += 1
+        s /= 2
+    return levels
+
+
+def fractal_squares(depth=4, size=1.0, pixel=None, min_px=1.0, max_segments=None):
+    """
+    Centres and half-sizes (x, y, s) of every visible square: pixel is the
+    data units per output pixel (default: the 6in figure at DEFAULT_DPI),
+    0 for no pruning at all.
+
+    Raises FractalBudgetError up front if the visible levels hold more than
+    max_segments segments (default MAX_SEGMENTS; 0 disables the check).
+    """
+    pixel = fractal_pixel_size(depth, size) if pixel is None else pixel
+    max_segments = MAX_SEGMENTS if max_segments is None else max_segments
+    levels = fractal_levels(depth, size, pixel, min_px)
+
+    n_segments = 4 * (4 ** levels - 1) // 3
+    if max_segments and n_segments > max_segments:
+        raise FractalBudgetError(
+            f"fractal depth {depth} needs {n_segments} segments at this resolution "
+            f"(budget {max_segments})")
+
+    centres = [np.zeros((1, 2))]
+    halves = [np.array([float(size)])]
+    for _ in range(levels - 1):
+        c, s = centres[-1], halves[-1]
+        centres.append((c[:, None, :] + s[:, None, None] * _CHILD_OFFSETS).reshape(-1, 2))
+        halves.append(np.repeat(s / 2, 4))
+    if not levels:
+        return np.empty(0), np.empty(0), np.empty(0)
+    xy = np.concatenate(centres)
+    s = np.concatenate(halves)
+
+    if pixel > 0:
+        # Squares that coincide at a quarter-pixel grid draw the same pixels
+        key = np.rint(np.column_stack([xy, s]) / (pixel / 4)).astype(np.int64)
+        _, first = np.unique(key, axis=0, return_index=True)
+        first.sort()
+        xy, s = xy[first], s[first]
+    return xy[:, 0], xy[:, 1], s
+
+
+def fractal_polylines(depth=4, size=1.0, pixel=None, min_px=1.0, max_segments=None):
+    """
+    Closed square outlines as one (n, 5, 2) array.
+    """
+    x, y, s = fractal_squares(depth, size, pixel, min_px, max_segments)
+    return np.column_stack([x, y])[:, None, :] + s[:, None, None] * _OUTLINE
@@ -0,0 +1,132 @@
+"""
+Analysis previews drawn straight onto uint8 arrays.
+
+Dots and skeletons are stamped with NumPy indexing rather than one
+matplotlib artist per point, and each preview is encoded once, so a
+preview costs a few milliseconds instead of a figure, an imshow and a
+savefig.
+
+Previews are single-channel palette PNGs (kolam.raster.PNGWriter): a gray
+ramp, with the top entries given to marker colours when there are any.
+At one byte per pixel with no filtering this encodes 2-3x faster than
+cv2.imencode, for a slightly larger file.
+"""
+import base64
+import io
+
+import cv2
+import numpy as np
+
+from kolam.raster import PNGWriter
+
+GRAY_PALETTE = np.repeat(np.arange(256, dtype=np.uint8)[:, None], 3, axis=1)
+
+# RGB colours matching the matplotlib previews ('k', 'r', 'gray')
+BLACK = (0, 0, 0)
+RED = (255, 0, 0)
+GRAY = (128, 128, 128)
+
+
+def to_canvas(img):
+    """
+    Any analysis image -> single-channel uint8 canvas. Booleans map to
+    black/white and gray images are stretched to the full range, as imshow
+    with cmap='gray' displays them.
+    """
+    img = np.asarray(img)
+    if img.dtype == bool:
+        return img.astype(np.uint8) * 255
+    if img.ndim == 3:
+        img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    return cv2.normalize(img, None, 0, 255, cv2.NORM_MINMAX, dtype=cv2.CV_8U)
+
+
+def default_dot_radius(shape):
+    # About the size a 5pt marker had in the old 8in previews
+    return max(2, int(round(max(shape[:2]) / 230)))
+
+
+def _disk(radius):
+    r = np.arange(-radius, radius + 1)
+    dy, dx = np.meshgrid(r, r, indexing="ij")
+    inside = dx*dx + dy*dy <= radius*radius + radius    # +radius rounds the rim like cv2.circle
+    return dy[inside], dx[inside]
+
+
+def draw_dots(canvas, dots, value=0, radius=None):
+    """
+    Stamp a filled disk of value at every (x, y) in dots, in place.
+    """
+    if len(dots) == 0:
+        return canvas
+    radius = default_dot_radius(canvas.shape) if radius is None else radius
+    pts = np.rint(np.asarray(dots, dtype=float)).astype(np.int64)
+    dy, dx = _disk(radius)
+    ys = (pts[:, 1, None] + dy[None, :]).ravel()
+    xs = (pts[:, 0, None] + dx[None, :]).ravel()
+    keep = (ys >= 0) & (ys < canvas.shape[0]) & (xs >= 0) & (xs < canvas.shape[1])
+    canvas[ys[keep], xs[keep]] = value
+    return canvas
+
+
+def draw_mask(canvas, mask, value=128):
+    """
+    Set every true pixel of mask (e.g. a skeleton) to value, in place.
+    """
+    canvas[np.asarray(mask, dtype=bool)] = value
+    return canvas
+
+
+def overlay_preview(image, skeleton=None, dots=None, dot_color=BLACK,
+                    skeleton_color=GRAY, dot_radius=None):
+    """
+    Preview of image with an optional skeleton and dot markers on top.
+
+    Returns (canvas, palette). palette is None when every colour used is a
+    gray (the canvas is plain gray levels); otherwise canvas holds palette
+    indices: gray levels first, then one index per marker colour at the top.
+    """
+    canvas = to_canvas(image)
+    used = []
+    if skeleton is not None:
+        used.append(tuple(skeleton_color))
+    if dots is not None:
+        used.append(tuple(dot_color))
+    colors = []
+    for c in used:
+        if not c[0] == c[1] == c[2] and c not in colors:
+            colors.append(c)
+    top = 255 - len(colors)      # highest gray level left after reserving marker entries
+
+    def value(color):
+        color = tuple(color)
+        return top + 1 + colors.index(color) if color in colors else min(color[0], top)
+
+    palette = None
+    if colors:
+        np.minimum(canvas, top, out=canvas)
+        palette = np.zeros((256, 3), dtype=np.uint8)
+        palette[:top + 1] = np.arange(top + 1)[:, None]
+        palette[top + 1:] = colors
+
+    if skeleton is not None:
+        draw_mask(canvas, skeleton, value(skeleton_color))
+    if dots is not None:
+        draw_dots(canvas, dots, value(dot_color), dot_radius)
+    return canvas, palette
+
+
+def encode_png(canvas, palette=None):
+    """
+    PNG bytes for a single-channel canvas; gray levels unless a palette is given.
+    """
+    buf = io.BytesIO()
+    writer = PNGWriter(buf, canvas.shape[1], canvas.shape[0],
+                       GRAY_PALETTE if palette is None else palette)
+    writer.write_rows(canvas)
+    writer.close()
+    return buf.getvalue()
+
+
+def png_base64(canvas, palette=None):
+    return base64.b64encode(encode_png(canvas, palette)).decode("utf-8")
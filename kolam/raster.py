@@ -0,0 +1,366 @@
+"""
+Matplotlib-free raster backend for generated kolams.
+
+Draws the geometry produced by main.kolam_geometry straight into anti-aliased
+uint8 coverage masks with OpenCV and writes them out as an 8-bit palette PNG,
+so a render costs milliseconds instead of a figure + savefig.
+"""
+import io
+import struct
+import zlib
+
+import cv2
+import numpy as np
+from PIL import ImageColor
+
+# Framing that matches the matplotlib backend: a 6x6in figure whose
+# equal-aspect axes end up 4.62in on the long side, saved with
+# bbox_inches="tight" (0.1in padding) at 200 dpi.
+AXES_INCHES = 4.62
+PAD_INCHES = 0.1
+DEFAULT_DPI = 200
+AUTOSCALE_MARGIN = 0.05     # matplotlib's default axes margins
+SHIFT = 4                   # fractional bits for cv2 sub-pixel coordinates
+FIXED = 1 << SHIFT
+LEVELS = 16                 # anti-aliasing levels per mask in the palette
+
+
+# ---------------- Colours ----------------
+def parse_color(color):
+    """
+    Any CSS/matplotlib-style colour ("black", "#fa0", "#ffaa00", (r, g, b)) -> RGB tuple.
+    """
+    if isinstance(color, (tuple, list)):
+        return tuple(int(round(c * 255)) if isinstance(c, float) else int(c) for c in color[:3])
+    return ImageColor.getrgb(color)[:3]
+
+
+def build_palette(line_color, dot_color, bg_color):
+    """
+    256-entry RGB palette indexed by (line_level * LEVELS + dot_level):
+    background blended towards the line colour, then the dot colour on top.
+    """
+    bg = np.array(parse_color(bg_color), dtype=float)
+    line = np.array(parse_color(line_color), dtype=float)
+    dot = np.array(parse_color(dot_color), dtype=float)
+    a = (np.arange(LEVELS) / (LEVELS - 1))[:, None, None]
+    d = (np.arange(LEVELS) / (LEVELS - 1))[None, :, None]
+    under = bg + (line - bg) * a
+    palette = under + (dot - under) * d
+    return np.rint(palette).reshape(-1, 3).astype(np.uint8)
+
+
+# ---------------- Framing ----------------
+def data_bounds(geom):
+    """
+    View limits for a geometry: its fixed bounds, or the data extent plus
+    matplotlib's autoscale margin.
+    """
+    if geom["bounds"] is not None:
+        return geom["bounds"]
+
+    xs, ys = [], []
+    lines = geom["polylines"]
+    if isinstance(lines, np.ndarray):
+        if lines.size:
+            xs.append(lines[..., 0].ravel()); ys.append(lines[..., 1].ravel())
+    else:
+        for line in lines:
+            xs.append(line[:, 0]); ys.append(line[:, 1])
+    for key in ("arcs", "circles", "dots"):
+        shapes = geom[key]
+        if len(shapes):
+            r = shapes[:, 2]
+            xs += [shapes[:, 0] - r, shapes[:, 0] + r]
+            ys += [shapes[:, 1] - r, shapes[:, 1] + r]
+    if not xs:
+        return (0.0, 1.0, 0.0, 1.0)
+
+    xs = np.concatenate(xs); ys = np.concatenate(ys)
+    x0, x1, y0, y1 = xs.min(), xs.max(), ys.min(), ys.max()
+    mx = (x1 - x0) * AUTOSCALE_MARGIN or 0.5
+    my = (y1 - y0) * AUTOSCALE_MARGIN or 0.5
+    return (x0 - mx, x1 + mx, y0 - my, y1 + my)
+
+
+def view_transform(bounds, dpi=DEFAULT_DPI):
+    """
+    Map data coordinates to pixels. Returns (scale, x0, y1, pad, width, height).
+    """
+    x0, x1, y0, y1 = bounds
+    dx = max(x1 - x0, 1e-12)
+    dy = max(y1 - y0, 1e-12)
+    scale = AXES_INCHES * dpi / max(dx, dy)
+    pad = int(round(PAD_INCHES * dpi))
+    width = int(round(dx * scale)) + 2 * pad
+    height = int(round(dy * scale)) + 2 * pad
+    return scale, x0, y1, pad, width, height
+
+
+def to_pixels(xy, scale, x0, y1, pad, origin=(0, 0)):
+    """
+    Data coordinates -> fixed-point pixel coordinates for cv2 (y axis flipped).
+
+    origin is the integer pixel position of the canvas inside the full
+    image; it is subtracted after rounding so a shape lands on exactly the
+    same pixels whichever tile draws it.
+    """
+    px = np.empty(xy.shape, dtype=np.int64)
+    px[..., 0] = np.rint((pad + (xy[..., 0] - x0) * scale) * FIXED)
+    px[..., 1] = np.rint((pad + (y1 - xy[..., 1]) * scale) * FIXED)
+    px[..., 0] -= origin[0] * FIXED
+    px[..., 1] -= origin[1] * FIXED
+    return px.astype(np.int32)
+
+
+# ---------------- Primitive tessellation ----------------
+def samples_for_radius(r_px):
+    # One vertex every ~8px of circumference keeps the chord error (s^2 / 8r)
+    # well under a pixel; thick AA strokes cost cv2 per segment, so no more
+    return int(max(12, min(720, np.ceil(2 * np.pi * r_px / 8.0)))) + 1
+
+
+def arc_vertices(arcs, samples):
+    """
+    (n, 5) cx, cy, r, theta1, theta2 -> (n, samples, 2) polyline vertices.
+    Sweeps follow matplotlib's Arc convention (see main.arc_spans).
+    """
+    t1, t2 = arcs[:, 3], arcs[:, 4]
+    span = np.mod(t2 - t1, 360.0)
+    span = np.where((span == 0) & (t2 != t1), 360.0, span)
+    theta = np.radians(t1[:, None] + span[:, None] * np.linspace(0.0, 1.0, samples)[None, :])
+    return np.stack([arcs[:, 0, None] + arcs[:, 2, None] * np.cos(theta),
+                     arcs[:, 1, None] + arcs[:, 2, None] * np.sin(theta)], axis=-1)
+
+
+def circle_vertices(circles, samples):
+    """
+    (n, 3) cx, cy, r -> (n, samples, 2) closed outlines.
+    """
+    full = np.column_stack([circles, np.zeros(len(circles)), np.full(len(circles), 360.0)])
+    return arc_vertices(full, samples)
+
+
+# ---------------- Drawing ----------------
+def draw_polylines(mask, lines_px, thickness, closed=False):
+    if len(lines_px):
+        cv2.polylines(mask, list(lines_px), closed, 255, thickness, cv2.LINE_AA, SHIFT)
+
+
+def draw_geometry(line_mask, dot_mask, geom, scale, x0, y1, pad, thickness, dot_edge_px=0.0,
+                  origin=(0, 0)):
+    """
+    Draw every primitive of a geometry as coverage into two uint8 masks
+    (strokes and dots). The mapping (scale, x0, y1, pad) is passed in, and
+    origin shifts it, so callers can draw one window of a larger image.
+    """
+    def px(xy):
+        return to_pixels(xy, scale, x0, y1, pad, origin)
+
+    lines = geom["polylines"]
+    lines = px(lines) if isinstance(lines, np.ndarray) else [px(line) for line in lines]
+    draw_polylines(line_mask, lines, thickness)
+
+    # Arcs: batch by radius so each batch tessellates in one NumPy op
+    arcs = geom["arcs"]
+    for r in (np.unique(arcs[:, 2]) if len(arcs) else []):
+        batch = arcs[arcs[:, 2] == r]
+        samples = samples_for_radius(r * scale)
+        draw_polylines(line_mask, px(arc_vertices(batch, samples)),
+                       thickness)
+
+    circles = geom["circles"]
+    for r in (np.unique(circles[:, 2]) if len(circles) else []):
+        batch = circles[circles[:, 2] == r]
+        samples = samples_for_radius(r * scale)
+        draw_polylines(line_mask, px(circle_vertices(batch, samples)),
+                       thickness, closed=True)
+
+    # Dots are filled; matplotlib also strokes them with a 1pt edge in the same colour
+    dots = geom["dots"]
+    if len(dots):
+        grown = dots.copy()
+        grown[:, 2] += dot_edge_px / scale
+        samples = samples_for_radius(grown[:, 2].max() * scale)
+        polys = px(circle_vertices(grown, samples)[:, :-1])
+        cv2.fillPoly(dot_mask, list(polys), 255, cv2.LINE_AA, SHIFT)
+
+
+def stroke_px(line_width, dpi=DEFAULT_DPI):
+    """
+    Line width in points (as matplotlib takes it) -> cv2 thickness.
+
+    cv2's anti-aliased strokes cover about thickness + 1.4px and only grow
+    in 2px steps, so pick the thickness whose ink width is closest.
+    """
+    px = line_width * dpi / 72.0
+    if px < 2.4:
+        return 1
+    return max(2, 2 * int(round((px - 1.4) / 2)))
+
+
+def render_masks(geom, line_width=1.5, dpi=DEFAULT_DPI, bounds=None):
+    """
+    Rasterize a geometry dict into (line_mask, dot_mask), each HxW uint8 coverage.
+    """
+    scale, x0, y1, pad, width, height = view_transform(bounds or data_bounds(geom), dpi)
+    line_mask = np.zeros((height, width), dtype=np.uint8)
+    dot_mask = np.zeros((height, width), dtype=np.uint8)
+    draw_geometry(line_mask, dot_mask, geom, scale, x0, y1, pad,
+                  stroke_px(line_width, dpi), 0.5 * dpi / 72.0)
+    return line_mask, dot_mask
+
+
+# Coverage (0-255) -> palette row / column, as lookup tables
+_LINE_LEVEL = ((np.arange(256) * (LEVELS - 1) + 127) // 255 * LEVELS).astype(np.uint8)
+_DOT_LEVEL = ((np.arange(256) * (LEVELS - 1) + 127) // 255).astype(np.uint8)
+
+
+def palette_index(line_mask, dot_mask):
+    """
+    Combine the two coverage masks into palette indices (see build_palette).
+    """
+    return _LINE_LEVEL[line_mask] + _DOT_LEVEL[dot_mask]
+
+
+def render_array(geom, line_color="black", dot_color="black", bg_color="white",
+                 line_width=1.5, dpi=DEFAULT_DPI, bounds=None):
+    """
+    Rasterize a geometry dict into an HxWx3 RGB uint8 array.
+
+    line_width is in points, as for matplotlib, so the same parameters give
+    the same stroke weight on both backends.
+    """
+    line_mask, dot_mask = render_masks(geom, line_width, dpi, bounds)
+    return build_palette(line_color, dot_color, bg_color)[palette_index(line_mask, dot_mask)]
+
+
+# ---------------- PNG ----------------
+class PNGWriter:
+    """
+    Minimal streaming writer for 8-bit palette PNGs.
+
+    Rows can be fed in any number of batches, so an image never has to exist
+    in memory in full; compressed data is flushed to the file object as it
+    is produced.
+    """
+    def __init__(self, fileobj, width, height, palette, compression=1):
+        self.fileobj = fileobj
+        self.width = width
+        self.height = height
+        self.rows_written = 0
+        self.compressor = zlib.compressobj(compression)
+        self.fileobj.write(b"\x89PNG\r\n\x1a\n")
+        self._chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 3, 0, 0, 0))
+        self._chunk(b"PLTE", np.asarray(palette, dtype=np.uint8).tobytes())
+
+    def _chunk(self, kind, data):
+        self.fileobj.write(struct.pack(">I", len(data)))
+        self.fileobj.write(kind)
+        self.fileobj.write(data)
+        self.fileobj.write(struct.pack(">I", zlib.crc32(data, zlib.crc32(kind)) & 0xFFFFFFFF))
+
+    def write_rows(self, rows):
+        """
+        rows: (n, width) uint8 palette indices.
+        """
+        rows = np.asarray(rows, dtype=np.uint8)
+        if rows.shape[1] != self.width or self.rows_written + len(rows) > self.height:
+            raise ValueError("rows do not fit the declared image size")
+        raw = np.zeros((len(rows), self.width + 1), dtype=np.uint8)   # filter byte 0 (None)
+        raw[:, 1:] = rows
+        data = self.compressor.compress(raw.tobytes())
+        if data:
+            self._chunk(b"IDAT", data)
+        self.rows_written += len(rows)
+
+    def close(self):
+        if self.rows_written != self.height:
+            raise ValueError(f"wrote {self.rows_written} of {self.height} rows")
+        self._chunk(b"IDAT", self.compressor.flush())
+        self._chunk(b"IEND", b"")
+
+
+def render_png(geom, line_color="black", dot_color="black", bg_color="white",
+               line_width=1.5, dpi=DEFAULT_DPI, compression=1):
+    """
+    Rasterize a geometry dict and return palette PNG bytes.
+    """
+    line_mask, dot_mask = render_masks(geom, line_width, dpi)
+    buf = io.BytesIO()
+    writer = PNGWriter(buf, line_mask.shape[1], line_mask.shape[0],
+                       build_palette(line_color, dot_color, bg_color), compression)
+    writer.write_rows(palette_index(line_mask, dot_mask))
+    writer.close()
+    return buf.getvalue()
+
+
+def replace_palette(png, palette):
+    """
+    Copy of a palette PNG with its PLTE chunk swapped. Pixel data stores
+    palette indices only, so this recolours an image without re-encoding.
+    """
+    plte = np.asarray(palette, dtype=np.uint8).tobytes()
+    out = io.BytesIO()
+    out.write(png[:8])
+    pos = 8
+    while pos < len(png):
+        length, = struct.unpack(">I", png[pos:pos + 4])
+        kind = png[pos + 4:pos + 8]
+        end = pos + 12 + length
+        if kind == b"PLTE":
+            out.write(struct.pack(">I", len(plte)) + kind + plte)
+            out.write(struct.pack(">I", zlib.crc32(plte, zlib.crc32(kind)) & 0xFFFFFFFF))
+        else:
+            out.write(png[pos:end])
+        pos = end
+    return out.getvalue()
+
+
+def render_tiled(fileobj, bounds, geometry_for_window, scale,
+                 line_color="black", dot_color="black", bg_color="white",
+                 line_width=1.5, dpi=DEFAULT_DPI, tile_px=1024, compression=1):
+    """
+    Render an arbitrarily large image tile by tile and stream it as PNG.
+
+    geometry_for_window(window) must return the geometry that can reach
+    into the data rectangle window=(xmin, xmax, ymin, ymax); scale is pixels
+    per data unit. Only one band of tile_px rows (as palette indices) and
+    one tile's masks are in memory at a time. Returns (width, height).
+    """
+    x0, x1, y0, y1 = bounds
+    pad = int(round(PAD_INCHES * dpi))
+    width = int(round((x1 - x0) * scale)) + 2 * pad
+    height = int(round((y1 - y0) * scale)) + 2 * pad
+    thickness = stroke_px(line_width, dpi)
+    dot_edge = 0.5 * dpi / 72.0
+    # cv2 clips strokes at the canvas edge and the AA fringe there differs
+    # from an unclipped draw, so each tile is drawn with a guard band that
+    # is cropped away; anything within the guard can still touch the tile
+    guard = thickness + 4
+    reach = (guard + dot_edge) / scale
+
+    writer = PNGWriter(fileobj, width, height,
+                       build_palette(line_color, dot_color, bg_color), compression)
+    band = np.empty((min(tile_px, height), width), dtype=np.uint8)
+    line_mask = np.empty((min(tile_px, height) + 2 * guard, min(tile_px, width) + 2 * guard),
+                         dtype=np.uint8)
+    dot_mask = np.empty_like(line_mask)
+    for ty in range(0, height, tile_px):
+        th = min(tile_px, height - ty)
+        for tx in range(0, width, tile_px):
+            tw = min(tile_px, width - tx)
+            window = (x0 + (tx - pad) / scale - reach, x0 + (tx + tw - pad) / scale + reach,
+                      y1 - (ty + th - pad) / scale - reach, y1 - (ty - pad) / scale + reach)
+            geom = geometry_for_window(window)
+            lm = line_mask[:th + 2 * guard, :tw + 2 * guard]
+            dm = dot_mask[:th + 2 * guard, :tw + 2 * guard]
+            lm[:] = 0
+            dm[:] = 0
+            draw_geometry(lm, dm, geom, scale, x0, y1, pad, thickness, dot_edge,
+                          origin=(tx - guard, ty - guard))
+            band[:th, tx:tx + tw] = palette_index(lm[guard:guard + th, guard:guard + tw],
+                                                  dm[guard:guard + th, guard:guard + tw])
+        writer.write_rows(band[:th])
+    writer.close()
+    return width, height
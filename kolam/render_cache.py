@@ -0,0 +1,118 @@
+"""
+Content-addressed cache for /generate_kolam renders.
+
+A render is keyed on its normalized parameter set: defaults filled in,
+numbers and colours canonicalized, and parameters the chosen pattern never
+reads dropped. The key is a SHA-256 of that set and RENDER_VERSION, which
+also serves as the strong ETag of the response.
+"""
+import hashlib
+import inspect
+import json
+import os
+
+from PIL import ImageColor
+
+from kolam.cache import LRUCache
+from kolam.scene import SHAPE_PARAMS
+from main import generate_kolam_image
+
+# Bump whenever the bytes rendered for the same parameters change, so stale
+# disk-tier entries and browser copies (ETags) stop matching
+RENDER_VERSION = 2
+
+RENDER_DEFAULTS = {
+    name: p.default
+    for name, p in inspect.signature(generate_kolam_image).parameters.items()
+}
+
+# Parameters each pattern actually reads (on top of COMMON_PARAMS): its
+# shape, plus the dot colour for weaves
+PATTERN_PARAMS = {
+    pattern: names + (("dot_color",) if pattern == "weave" else ())
+    for pattern, names in SHAPE_PARAMS.items()
+}
+COMMON_PARAMS = ("pattern", "output_format", "backend", "line_color", "bg_color", "line_width")
+VECTOR_FORMATS = ("svg", "pdf")
+
+INT_PARAMS = {"rows", "cols", "n_petals", "rings", "fractal_depth", "turns", "layers", "petals",
+              "cell_px"}
+FLOAT_PARAMS = {"spacing", "radius", "dot_radius", "line_width", "ring_scale"}
+COLOR_PARAMS = {"line_color", "dot_color", "bg_color"}
+
+
+def _canonical_float(value):
+    # 12 significant digits: "1", "1.0" and 1.0000000000001 all hash the same
+    return float(f"{float(value):.12g}")
+
+
+def _canonical_color(value):
+    try:
+        r, g, b = ImageColor.getrgb(value)[:3]
+    except (ValueError, AttributeError):
+        return str(value).strip().lower()
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+
+def normalize_render_params(params):
+    """
+    Fill defaults, canonicalize values and drop parameters the pattern ignores.
+    """
+    merged = dict(RENDER_DEFAULTS)
+    merged.update({k: v for k, v in params.items() if k in RENDER_DEFAULTS})
+    pattern = merged["pattern"]
+
+    keep = set(COMMON_PARAMS) | set(PATTERN_PARAMS.get(pattern, ()))
+    if pattern == "weave" and not merged["dot_grid"]:
+        keep -= {"dot_radius", "dot_color"}
+    if merged["output_format"] in VECTOR_FORMATS:
+        # Vector output is written straight from the geometry, whatever the raster backend
+        keep.discard("backend")
+    elif pattern == "weave":
+        if merged["backend"] == "matplotlib":
+            keep.add("weave_mode")
+        elif merged["backend"] == "tiled":
+            keep.add("cell_px")     # tile_px only changes memory use, not pixels
+
+    normalized = {}
+    for name in sorted(keep):
+        value = merged[name]
+        if name in INT_PARAMS:
+            value = int(value)
+        elif name in FLOAT_PARAMS:
+            value = _canonical_float(value)
+        elif name in COLOR_PARAMS:
+            value = _canonical_color(value)
+        elif name == "dot_grid":
+            value = bool(value)
+        normalized[name] = value
+    return normalized
+
+
+def render_key(normalized):
+    """
+    SHA-256 hex digest of a normalized parameter set and RENDER_VERSION.
+    """
+    blob = json.dumps({"params": normalized, "version": RENDER_VERSION}, sort_keys=True,
+                      separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+# One cache per process; size and disk tier come from the environment
+render_cache = LRUCache(
+    max_bytes=int(os.getenv("KOLAM_RENDER_CACHE_BYTES", 64 * 1024 * 1024)),
+    disk_dir=os.getenv("KOLAM_RENDER_CACHE_DIR") or None,
+    disk_max_bytes=int(os.getenv("KOLAM_RENDER_CACHE_DISK_BYTES", 0)) or None,
+)
+
+
+def render_cached(normalized, key=None, cache=render_cache):
+    """
+    PNG bytes for a normalized parameter set, rendering only on a cache miss.
+    """
+    key = key or render_key(normalized)
+    data = cache.get(key)
+    if data is None:
+        data = generate_kolam_image(**normalized).getvalue()
+        cache.put(key, data)
+    return data
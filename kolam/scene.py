@@ -0,0 +1,144 @@
+"""
+KolamScene: the pure geometry of one kolam design.
+
+A scene records what to draw (polylines, arcs, circles, dots and view
+bounds) for a pattern and its shape parameters, and nothing about how:
+colours and line width are applied when the scene is rendered. Scenes are
+immutable, so one instance can be shared between renders, and they
+round-trip through a compressed .npz so other tools can reuse them.
+"""
+import hashlib
+import io
+import json
+import threading
+
+import numpy as np
+
+from kolam.raster import DEFAULT_DPI, build_palette, render_png, replace_palette
+
+FORMAT_VERSION = 1
+# Encoded rasters kept per scene (one per line width / dpi in use)
+RASTER_SLOTS = 4
+
+# Shape parameters each pattern's geometry depends on
+SHAPE_PARAMS = {
+    "weave": ("rows", "cols", "spacing", "weave_style", "dot_grid", "dot_radius"),
+    "radial": ("n_petals", "rings", "radius", "ring_scale"),
+    "fractal": ("fractal_depth", "radius"),
+    "spiral": ("turns", "spacing"),
+    "mandala": ("layers", "n_petals", "radius"),
+    "lattice": ("rows", "cols", "spacing"),
+    "flower": ("n_petals", "radius"),
+}
+
+ARRAY_KEYS = ("arcs", "circles", "dots")
+
+
+def _frozen(arr):
+    arr = np.array(arr, dtype=float)
+    arr.setflags(write=False)
+    return arr
+
+
+class KolamScene:
+    """
+    Geometry for one pattern + shape parameters (see main.kolam_geometry
+    for the layout of the geometry dict).
+    """
+    def __init__(self, pattern, shape, geometry):
+        self.pattern = pattern
+        self.shape = dict(shape)
+        lines = geometry["polylines"]
+        self.geometry = {
+            "polylines": _frozen(lines) if isinstance(lines, np.ndarray)
+                         else [_frozen(line) for line in lines],
+            "bounds": tuple(map(float, geometry["bounds"])) if geometry["bounds"] is not None else None,
+        }
+        for key in ARRAY_KEYS:
+            self.geometry[key] = _frozen(geometry[key])
+        self._rasters = {}
+        self._lock = threading.Lock()
+
+    @property
+    def key(self):
+        """
+        SHA-256 of pattern + shape; equal keys mean equal geometry.
+        """
+        blob = json.dumps({"pattern": self.pattern, "shape": self.shape},
+                          sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    @property
+    def nbytes(self):
+        lines = self.geometry["polylines"]
+        total = lines.nbytes if isinstance(lines, np.ndarray) else sum(l.nbytes for l in lines)
+        return total + sum(self.geometry[k].nbytes for k in ARRAY_KEYS)
+
+    def __repr__(self):
+        lines = self.geometry["polylines"]
+        counts = ", ".join(f"{k}={len(self.geometry[k])}" for k in ARRAY_KEYS)
+        return f"KolamScene({self.pattern!r}, polylines={len(lines)}, {counts})"
+
+    # ---------------- Rasterization ----------------
+    def png(self, line_color="black", dot_color="black", bg_color="white",
+            line_width=1.5, dpi=DEFAULT_DPI):
+        """
+        Raster-backend PNG bytes. Coverage depends only on geometry, line
+        width and dpi, so each width is encoded once and recolouring just
+        swaps the palette.
+        """
+        slot = (float(line_width), dpi)
+        with self._lock:
+            template = self._rasters.pop(slot, None)
+        if template is None:
+            template = render_png(self.geometry, line_width=line_width, dpi=dpi)
+        with self._lock:
+            self._rasters[slot] = template      # most recent last
+            while len(self._rasters) > RASTER_SLOTS:
+                self._rasters.pop(next(iter(self._rasters)))
+        return replace_palette(template, build_palette(line_color, dot_color, bg_color))
+
+    # ---------------- Serialization ----------------
+    def to_bytes(self):
+        """
+        Compressed .npz: a JSON header plus one array per shape kind.
+        Ragged polylines are stored as concatenated vertices + offsets.
+        """
+        lines = self.geometry["polylines"]
+        arrays = {k: self.geometry[k] for k in ARRAY_KEYS}
+        stacked = isinstance(lines, np.ndarray)
+        if stacked:
+            arrays["polylines"] = lines
+        else:
+            arrays["polyline_vertices"] = (np.concatenate(lines) if lines else np.empty((0, 2)))
+            arrays["polyline_offsets"] = np.cumsum([0] + [len(l) for l in lines])
+        header = {"version": FORMAT_VERSION, "pattern": self.pattern, "shape": self.shape,
+                  "bounds": self.geometry["bounds"], "stacked_polylines": stacked}
+        arrays["header"] = np.frombuffer(json.dumps(header).encode("utf-8"), dtype=np.uint8)
+        buf = io.BytesIO()
+        np.savez_compressed(buf, **arrays)
+        return buf.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data):
+        with np.load(io.BytesIO(data), allow_pickle=False) as npz:
+            header = json.loads(npz["header"].tobytes().decode("utf-8"))
+            if header["version"] != FORMAT_VERSION:
+                raise ValueError(f"unsupported scene format version {header['version']}")
+            geometry = {k: npz[k] for k in ARRAY_KEYS}
+            if header["stacked_polylines"]:
+                geometry["polylines"] = npz["polylines"]
+            else:
+                vertices, offsets = npz["polyline_vertices"], npz["polyline_offsets"]
+                geometry["polylines"] = [vertices[a:b] for a, b in zip(offsets[:-1], offsets[1:])]
+        geometry["bounds"] = header["bounds"]
+        return cls(header["pattern"], header["shape"], geometry)
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read())
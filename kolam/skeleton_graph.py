@@ -0,0 +1,173 @@
+"""
+Skeleton bitmap -> stroke graph.
+
+Every skeleton pixel's 8-neighbour count comes from one convolution:
+pixels with exactly two neighbours lie on a stroke, everything else is a
+node (1: endpoint, 3+: junction, 0: an isolated pixel). Touching junction
+pixels are merged into one node. Removing the nodes leaves the strokes as
+separate runs of pixels, so one connected-components pass labels every
+edge at once; which nodes an edge joins and how long it is come from the
+pixel adjacencies, gathered with array shifts and bincount. All of it is
+linear in the image size, with no per-pixel Python loop, so full-resolution
+scans stay cheap.
+
+The graph is a dict of arrays:
+
+    nodes        (n, 2) node centres (x, y)
+    node_kind    (n,)   0 isolated, 1 endpoint, 3 junction, 2 the anchor of
+                        a closed stroke with no node on it (a bare loop)
+    node_degree  (n,)   edge ends at each node (a self-loop counts twice)
+    edges        (m, 2) node indices at both ends of each stroke
+    edge_length  (m,)   stroke lengths in pixels (diagonal steps count sqrt 2)
+    components   int    connected pieces of the skeleton
+
+Closed loops are the independent cycles of that graph,
+edges - nodes + components, which counts each enclosed face once however
+many junctions sit on its boundary.
+"""
+import cv2
+import numpy as np
+
+ISOLATED, ENDPOINT, LOOP, JUNCTION = 0, 1, 2, 3
+
+_NEIGHBOURS = np.ones((3, 3), np.float32)
+_NEIGHBOURS[1, 1] = 0
+# Half of the 8-neighbourhood: every adjacent pair is seen once
+_HALF_OFFSETS = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+
+def _shifted_pairs(mask, dy, dx):
+    """
+    Flat indices (a, b) of every pair of set pixels with b = a + (dy, dx).
+    """
+    h, w = mask.shape
+    ys, xs = np.nonzero(mask[max(0, -dy):h - max(0, dy), max(0, -dx):w - max(0, dx)])
+    ys, xs = ys + max(0, -dy), xs + max(0, -dx)
+    keep = mask[ys + dy, xs + dx]
+    ys, xs = ys[keep], xs[keep]
+    return ys * w + xs, (ys + dy) * w + (xs + dx), ys, xs
+
+
+def _adjacent_pairs(sk):
+    """
+    Pixel adjacencies along the skeleton with their step lengths. A
+    diagonal step is skipped when an orthogonal pixel already bridges it,
+    so staircase corners are not counted twice.
+    """
+    firsts, seconds, weights = [], [], []
+    for dy, dx in _HALF_OFFSETS:
+        a, b, ys, xs = _shifted_pairs(sk, dy, dx)
+        if dy and dx:
+            bridged = sk[ys + dy, xs] | sk[ys, xs + dx]
+            a, b = a[~bridged], b[~bridged]
+            weights.append(np.full(len(a), np.sqrt(2)))
+        else:
+            weights.append(np.ones(len(a)))
+        firsts.append(a)
+        seconds.append(b)
+    return np.concatenate(firsts), np.concatenate(seconds), np.concatenate(weights)
+
+
+def skeleton_graph(skeleton):
+    """
+    Stroke graph (see module docstring) of a boolean skeleton image.
+    """
+    sk = np.asarray(skeleton, dtype=bool)
+    h, w = sk.shape
+    sk_u8 = sk.astype(np.uint8)
+    counts = cv2.filter2D(sk_u8, cv2.CV_8U, _NEIGHBOURS, borderType=cv2.BORDER_CONSTANT)
+
+    node_mask = sk & (counts != 2)
+    edge_mask = sk & (counts == 2)
+    n_components = cv2.connectedComponents(sk_u8, connectivity=8)[0] - 1
+    n_nodes, node_labels = cv2.connectedComponents(node_mask.astype(np.uint8), connectivity=8)
+    n_runs, edge_labels = cv2.connectedComponents(edge_mask.astype(np.uint8), connectivity=8)
+    n_nodes, n_runs = n_nodes - 1, n_runs - 1
+    node_labels, edge_labels = node_labels.ravel() - 1, edge_labels.ravel() - 1     # -1: none
+
+    # Node centres and kinds (a merged junction keeps its largest neighbour count)
+    ys, xs = np.nonzero(node_mask)
+    ids = node_labels[ys * w + xs]
+    size = np.bincount(ids, minlength=n_nodes)
+    nodes = np.column_stack([np.bincount(ids, xs, n_nodes), np.bincount(ids, ys, n_nodes)])
+    nodes = nodes / np.maximum(size, 1)[:, None]
+    node_kind = np.zeros(n_nodes, dtype=np.uint8)
+    np.maximum.at(node_kind, ids, np.minimum(counts[ys, xs], JUNCTION))
+
+    # Node pixels that touch belong to one node, so every adjacency involving
+    # a node pixel either stays inside that node or steps onto a run
+    a, b, weight = _adjacent_pairs(sk)
+    ea, eb, na, nb = edge_labels[a], edge_labels[b], node_labels[a], node_labels[b]
+
+    # Stroke lengths: steps inside a run plus the steps onto its end nodes
+    run = np.where(ea >= 0, ea, eb)
+    on_run = run >= 0
+    run_length = np.bincount(run[on_run], weight[on_run], minlength=n_runs)
+
+    # Which nodes each run touches
+    touch = np.concatenate([np.column_stack([ea, nb])[(ea >= 0) & (nb >= 0)],
+                            np.column_stack([eb, na])[(eb >= 0) & (na >= 0)]])
+    touch = np.unique(touch, axis=0) if len(touch) else touch.reshape(0, 2)
+    n_touch = np.bincount(touch[:, 0], minlength=n_runs)
+
+    edges, lengths = [], []
+    extra_nodes, extra_kind = [], []
+    # Runs between two nodes (or from a node back to itself) are plain edges
+    starts = np.searchsorted(touch[:, 0], np.arange(n_runs))
+    two = np.flatnonzero(n_touch == 2)
+    edges.append(np.column_stack([touch[starts[two], 1], touch[starts[two] + 1, 1]]))
+    lengths.append(run_length[two])
+    one = np.flatnonzero(n_touch == 1)
+    edges.append(np.repeat(touch[starts[one], 1][:, None], 2, axis=1))
+    lengths.append(run_length[one])
+
+    # Bare loops (no node) and runs fanning into 3+ nodes get a node of their own
+    ry, rx = np.nonzero(edge_mask)
+    rid = edge_labels[ry * w + rx]
+    rsize = np.maximum(np.bincount(rid, minlength=n_runs), 1)
+    centres = np.column_stack([np.bincount(rid, rx, n_runs), np.bincount(rid, ry, n_runs)]) / rsize[:, None]
+    next_id = n_nodes
+    for r in np.flatnonzero((n_touch == 0) | (n_touch > 2)):
+        extra_nodes.append(centres[r])
+        if n_touch[r] == 0:
+            extra_kind.append(LOOP)
+            edges.append(np.array([[next_id, next_id]]))
+            lengths.append(run_length[r:r + 1] + 1)          # closing step
+        else:
+            extra_kind.append(JUNCTION)
+            ends = touch[starts[r]:starts[r] + n_touch[r], 1]
+            edges.append(np.column_stack([np.full(len(ends), next_id), ends]))
+            lengths.append(np.full(len(ends), run_length[r] / len(ends)))
+        next_id += 1
+
+    edges = np.concatenate(edges).astype(np.int64).reshape(-1, 2)
+    if extra_nodes:
+        nodes = np.concatenate([nodes, np.array(extra_nodes)])
+        node_kind = np.concatenate([node_kind, np.array(extra_kind, dtype=np.uint8)])
+    node_degree = np.bincount(edges.ravel(), minlength=len(nodes))
+    return {
+        "nodes": nodes,
+        "node_kind": node_kind,
+        "node_degree": node_degree,
+        "edges": edges,
+        "edge_length": np.concatenate(lengths).astype(float),
+        "components": int(n_components),
+    }
+
+
+def graph_features(graph):
+    """
+    Kolam features of a stroke graph: closed loops, junctions, endpoints
+    and stroke lengths.
+    """
+    lengths = graph["edge_length"]
+    kind = graph["node_kind"]
+    loops = len(graph["edges"]) - len(graph["nodes"]) + graph["components"]
+    return {
+        "graph_loops": int(loops),
+        "graph_junctions": int(np.sum(kind == JUNCTION)),
+        "graph_endpoints": int(np.sum(kind == ENDPOINT)),
+        "graph_edges": len(lengths),
+        "stroke_length_total": float(lengths.sum()),
+        "stroke_length_mean": float(lengths.mean()) if len(lengths) else 0.0,
+    }
@@ -0,0 +1,121 @@
+"""
+Cache of style Gram matrices for /stylize.
+
+A style image only enters style transfer through the Gram matrices of its
+VGG features at the style layers, and those depend on nothing but the
+image, the size it is loaded at, the layers and the network weights. They
+are stored in an LRUCache (memory tier plus disk tier) keyed on a SHA-256
+of all four, so a request with a known style skips the style image's
+decode, its forward pass and every Gram computation. Editing a gallery
+file, changing the weights or the layer set simply produces new keys.
+
+The bundled gallery (static/styles) can be precomputed ahead of time;
+uploaded styles are added on first use like any other.
+
+This module does not import torch until targets are actually loaded or
+computed, so the app can report its stats without loading the network.
+
+Usage:
+    python -m kolam.style_cache warm [--size 512 256] [paths ...]
+"""
+import argparse
+import glob
+import hashlib
+import io
+import json
+import os
+import time
+
+import numpy as np
+
+from kolam.cache import LRUCache
+
+STYLE_CACHE_VERSION = 1
+STYLE_DIR = os.path.join("static", "styles")
+STYLE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+
+
+def style_key(data, size, layers, network):
+    settings = {"size": size, "layers": list(layers), "network": network,
+                "version": STYLE_CACHE_VERSION}
+    h = hashlib.sha256(json.dumps(settings, sort_keys=True).encode("utf-8"))
+    h.update(data)
+    return h.hexdigest()
+
+
+def encode_grams(grams):
+    buf = io.BytesIO()
+    np.savez(buf, **{name: g.detach().cpu().numpy().astype(np.float32) for name, g in grams.items()})
+    return buf.getvalue()
+
+
+def decode_grams(data):
+    with np.load(io.BytesIO(data), allow_pickle=False) as npz:
+        return {name: npz[name] for name in npz.files}
+
+
+# One cache per process. Gram targets are ~0.4 MB per style and size with the
+# default layers; the disk tier is on by default so they survive restarts
+style_cache = LRUCache(
+    max_bytes=int(os.getenv("KOLAM_STYLE_CACHE_BYTES", 64 * 1024 * 1024)),
+    disk_dir=os.getenv("KOLAM_STYLE_CACHE_DIR", os.path.join("cache", "style_grams")) or None,
+    disk_max_bytes=int(os.getenv("KOLAM_STYLE_CACHE_DISK_BYTES", 0)) or None,
+)
+
+
+def style_targets(source, size=512, style_layers=None, cnn=None, cache=style_cache):
+    """
+    ({layer name: Gram tensor}, status) for a style image given as a path
+    or as upload bytes; status is "hit" or "miss".
+    """
+    import torch
+    from kolam.style_transfer import (DEFAULT_CONTENT_LAYERS, DEFAULT_STYLE_LAYERS, device,
+                                      load_image, network_key, style_grams, vgg_features)
+
+    style_layers = list(style_layers or DEFAULT_STYLE_LAYERS)
+    if cnn is None:
+        cnn = vgg_features(DEFAULT_CONTENT_LAYERS + style_layers)
+    if isinstance(source, (bytes, bytearray)):
+        data = bytes(source)
+    else:
+        with open(source, "rb") as f:
+            data = f.read()
+
+    key = style_key(data, size, style_layers, network_key(cnn))
+    cached = cache.get(key)
+    if cached is not None:
+        return {name: torch.from_numpy(g).to(device) for name, g in decode_grams(cached).items()}, "hit"
+
+    style_img = load_image(data, size=size).to(device)
+    grams = style_grams(cnn, style_img, style_layers)
+    cache.put(key, encode_grams(grams))
+    return grams, "miss"
+
+
+def gallery(style_dir=STYLE_DIR):
+    return sorted(p for p in glob.glob(os.path.join(style_dir, "*"))
+                  if p.lower().endswith(STYLE_EXTENSIONS))
+
+
+# ---------------- CLI ----------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute style Gram matrices.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    warm = commands.add_parser("warm", help="compute and store the targets of style images")
+    warm.add_argument("paths", nargs="*", help=f"style images (default: everything in {STYLE_DIR})")
+    warm.add_argument("--size", type=int, nargs="+", default=[512], help="load sizes to precompute")
+    args = parser.parse_args(argv)
+
+    if style_cache.disk_dir is None:
+        parser.error("KOLAM_STYLE_CACHE_DIR is empty: precomputed targets would not be kept")
+    for path in args.paths or gallery():
+        for size in args.size:
+            t0 = time.perf_counter()
+            _, status = style_targets(path, size=size)
+            print(json.dumps({"style": path, "size": size, "status": status,
+                              "ms": round((time.perf_counter() - t0) * 1000, 1)}))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
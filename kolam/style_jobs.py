@@ -0,0 +1,236 @@
+"""
+Background style-transfer jobs.
+
+A style transfer runs for tens of seconds to minutes on a CPU, far too
+long for a request thread. submit() records a job and hands it to a pool
+of worker processes, returning its id at once; at most `workers` jobs run
+at a time and the rest wait in the pool's queue. The web process itself
+never imports torch, so generation and analysis requests are served as
+usual while jobs run.
+
+Workers report progress (step, style and content loss) through a
+multiprocessing queue; a listener thread in the web process folds it into
+the job records, which clients read by polling get() or by following
+wait() (server-sent events in app.py). Everything is in-process: no
+broker, no database. Jobs do not survive a restart, and only the newest
+keep_finished finished jobs (with their JPEG results) are retained.
+
+Workers start from a forkserver rather than being forked from the web
+process: by the time the pool starts, that process runs the progress
+listener and request threads, and a fork would copy whatever locks they
+hold. The forkserver preloads kolam.style_transfer, so each worker still
+starts with torch imported; it loads the network on its first job, or
+shares the forkserver's copy with KOLAM_PRELOAD_STYLE_MODEL set.
+"""
+import io
+import itertools
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+FINISHED = (DONE, FAILED)
+
+_progress_queue = None
+# forkserver where the platform has it (not on Windows)
+START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+class QueueFull(Exception):
+    pass
+
+
+# ---------------- Worker side ----------------
+def _init_worker(progress_queue):
+    global _progress_queue
+    _progress_queue = progress_queue
+
+
+def run_job(job_id, content, style, size, num_steps, pyramid=True, engine="auto"):
+    """
+    Style-transfer one job in a worker process; (JPEG bytes, report).
+    content is upload bytes, style a gallery path or upload bytes.
+
+    engine "auto" uses the style's feed-forward network (kolam.fast_style)
+    when one has been trained, else optimizes; "optimize" always optimizes.
+    With pyramid, num_steps is unused: the levels of PYRAMID_LEVELS apply.
+    """
+    from kolam.fast_style import get_fast_model, stylize_fast
+    from kolam.style_cache import style_targets
+    from kolam.style_transfer import (device, load_image, pyramid_levels, run_style_transfer,
+                                      run_style_transfer_pyramid, tensor_to_pil)
+
+    _progress_queue.put((job_id, {"status": RUNNING, "started": time.time()}))
+    progress = lambda p: _progress_queue.put((job_id, p))
+    content_img = load_image(content, size=size).to(device)
+    net = get_fast_model(style) if engine == "auto" else None
+    if net is not None:
+        t0 = time.perf_counter()
+        output = stylize_fast(content_img, net)
+        report = {"engine": "fast", "seconds": round(time.perf_counter() - t0, 3)}
+    elif pyramid:
+        grams = {s: style_targets(style, size=s)[0] for s, _ in pyramid_levels(size)}
+        output, report = run_style_transfer_pyramid(content_img, grams=grams, progress=progress)
+        report["engine"] = "pyramid"
+    else:
+        report = {"engine": "optimize"}
+        grams, _ = style_targets(style, size=size)
+        output = run_style_transfer(content_img, None, num_steps=num_steps, grams=grams,
+                                    progress=progress, report=report)
+    buf = io.BytesIO()
+    tensor_to_pil(output).save(buf, format="JPEG")
+    return buf.getvalue(), report
+
+
+# ---------------- Queue ----------------
+class StyleJobQueue:
+    """
+    - workers:       worker processes, i.e. jobs running at once
+    - max_pending:   queued + running jobs accepted before submit raises QueueFull
+    - keep_finished: finished jobs (and results) kept for clients to collect
+    - pyramid:       run coarse-to-fine with early stopping (see
+                     run_style_transfer_pyramid) instead of num_steps at full size
+    """
+    def __init__(self, workers=1, max_pending=16, keep_finished=64, pyramid=True):
+        self.workers = workers
+        self.pyramid = pyramid
+        self.max_pending = max_pending
+        self.keep_finished = keep_finished
+        self._jobs = OrderedDict()        # id -> job record
+        self._results = {}                # id -> JPEG bytes
+        self._changed = threading.Condition()
+        self._order = itertools.count()
+        self._pool = None
+        self._broken_pool = None
+        self._progress = None
+        self._context = multiprocessing.get_context(START_METHOD)
+        if START_METHOD == "forkserver":
+            self._context.set_forkserver_preload(["kolam.style_transfer"])
+
+    def _start(self):
+        # Called with the lock held; processes and the listener start with the first job
+        if self._progress is None:
+            self._progress = self._context.Queue()
+            threading.Thread(target=self._listen, name="style-job-progress", daemon=True).start()
+        if self._broken_pool is not None:
+            self._broken_pool.shutdown(wait=False, cancel_futures=True)
+            self._broken_pool = None
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=self._context,
+                                             initializer=_init_worker, initargs=(self._progress,))
+
+    def _listen(self):
+        while True:
+            job_id, update = self._progress.get()
+            with self._changed:
+                job = self._jobs.get(job_id)
+                if job is None or job["status"] in FINISHED:
+                    continue
+                job.update(update)
+                job["updated"] = time.time()
+                job["rev"] += 1
+                if "step" in update and job.get("started"):
+                    # Pyramid jobs weight steps by their level's pixels (work); others count steps
+                    total = update.get("total_work", update["num_steps"])
+                    done = min(update.get("work", update["step"]), total)
+                    elapsed = job["updated"] - job["started"]
+                    job["eta_s"] = round(elapsed / done * (total - done), 1) if done else None
+                self._changed.notify_all()
+
+    def _finish(self, job_id, future, pool):
+        with self._changed:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job["finished"] = job["updated"] = time.time()
+            job["rev"] += 1
+            error = future.exception()
+            if error is None:
+                self._results[job_id], job["report"] = future.result()
+                job.update(status=DONE, eta_s=0)
+            else:
+                job.update(status=FAILED, error=str(error) or type(error).__name__, eta_s=None)
+                if isinstance(error, BrokenProcessPool) and pool is self._pool:
+                    # A worker died; start a fresh pool next time. This runs in the
+                    # pool's own manager thread, under its shutdown lock, so the
+                    # shutdown that releases its pipes has to wait for _start
+                    self._broken_pool, self._pool = self._pool, None
+            self._trim()
+            self._changed.notify_all()
+
+    def _trim(self):
+        finished = [k for k, j in self._jobs.items() if j["status"] in FINISHED]
+        for job_id in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self._jobs[job_id]
+            self._results.pop(job_id, None)
+
+    def submit(self, content, style, size=512, num_steps=200, engine="auto"):
+        """
+        Queue a job (engine: see run_job); returns its id. Raises QueueFull
+        when max_pending jobs are already waiting or running.
+        """
+        with self._changed:
+            pending = sum(j["status"] not in FINISHED for j in self._jobs.values())
+            if pending >= self.max_pending:
+                raise QueueFull(f"{pending} style jobs already pending")
+            self._start()
+            job_id = uuid.uuid4().hex
+            now = time.time()
+            self._jobs[job_id] = {"id": job_id, "status": QUEUED, "order": next(self._order), "rev": 0,
+                                  "created": now, "updated": now, "started": None, "finished": None,
+                                  "step": 0, "num_steps": num_steps, "style_loss": None,
+                                  "content_loss": None, "eta_s": None, "error": None, "report": None}
+            pool = self._pool
+            future = pool.submit(run_job, job_id, content, style, size, num_steps, self.pyramid, engine)
+        future.add_done_callback(lambda f: self._finish(job_id, f, pool))
+        return job_id
+
+    def get(self, job_id):
+        """
+        A copy of the job record (None if unknown), with its place in the
+        queue while it waits.
+        """
+        with self._changed:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            job = dict(job)
+            if job["status"] == QUEUED:
+                job["position"] = sum(j["status"] == QUEUED and j["order"] < job["order"]
+                                      for j in self._jobs.values())
+            return job
+
+    def result(self, job_id):
+        with self._changed:
+            return self._results.get(job_id)
+
+    def wait(self, job_id, rev=-1, timeout=15.0):
+        """
+        The job once its "rev" (bumped on every change) is past rev, or its
+        current state after timeout seconds.
+        """
+        with self._changed:
+            self._changed.wait_for(lambda: job_id not in self._jobs
+                                   or self._jobs[job_id]["rev"] > rev, timeout)
+        return self.get(job_id)
+
+    def stats(self):
+        with self._changed:
+            counts = {s: 0 for s in (QUEUED, RUNNING, DONE, FAILED)}
+            for job in self._jobs.values():
+                counts[job["status"]] += 1
+        return {"workers": self.workers, "max_pending": self.max_pending, **counts}
+
+
+# One queue per web process; limits come from the environment
+style_jobs = StyleJobQueue(
+    workers=int(os.getenv("KOLAM_STYLE_WORKERS", 1)),
+    max_pending=int(os.getenv("KOLAM_STYLE_MAX_PENDING", 16)),
+    keep_finished=int(os.getenv("KOLAM_STYLE_KEEP_JOBS", 64)),
+    pyramid=os.getenv("KOLAM_STYLE_PYRAMID", "1") != "0",
+)
@@ -1,31 +1,34 @@
+import hashlib
+import os
+import threading
+import time
+import weakref
+
 import torch
 import torch.nn as nn
 import torch.optim as optim
-import torchvision.models as models
 import torchvision.transforms as transforms
+from torchvision.models import vgg
 from PIL import Image
-import requests
-from io import BytesIO
-import matplotlib.pyplot as plt
-import base64
-from flask import Flask, request, jsonify, send_file
-import io
+import numpy as np
+from kolam.ingest import open_image
 
 # ------------------ Device ------------------
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
 # ------------------ Image Loader ------------------
 def load_image(source, size=512):
-    if isinstance(source, str):
-        if source.startswith("http"):  # URL
-            response = requests.get(source)
-            image = Image.open(BytesIO(response.content)).convert("RGB")
-        else:  # local path
-            image = Image.open(source).convert("RGB")
-    elif isinstance(source, Image.Image):
-        image = source.convert("RGB")
-    else:
-        raise ValueError("Unsupported image source type")
+    """
+    source: URL, path, upload bytes / file object, PIL image or RGB array.
+    """
+    if isinstance(source, str) and source.startswith("http"):  # URL
+        import requests
+        response = requests.get(source)
+        image = open_image(response.content, max_dim=size)
+    elif isinstance(source, np.ndarray):
+        image = Image.fromarray(source).convert("RGB")
+    else:  # decoded in memory, EXIF-oriented
+        image = open_image(source, max_dim=size)
 
     transform = transforms.Compose([
         transforms.Resize((size, size)),
@@ -51,86 +54,262 @@ def tensor_to_pil(tensor):
     return image
 
 
-# ------------------ Style Transfer Model ------------------
-cnn = models.vgg19(pretrained=True).features.to(device).eval()
+# ------------------ Model Manager ------------------
+DEFAULT_CONTENT_LAYERS = ['conv_4']
+DEFAULT_STYLE_LAYERS = ['conv_1', 'conv_2', 'conv_3', 'conv_4', 'conv_5']
+
+# Weights for the VGG19 features: unset for torchvision's ImageNet weights,
+# a path to a saved state dict, or "random" (seeded init, for offline runs)
+VGG_WEIGHTS = os.getenv("KOLAM_VGG_WEIGHTS")
+
+_vgg = {}
+_vgg_lock = threading.Lock()
+_network_keys = weakref.WeakKeyDictionary()
+
+
+def layer_names(layers):
+    """
+    conv_i / relu_i / pool_i / bn_i names of VGG feature layers, in order.
+    """
+    names, i = [], 0
+    for layer in layers:
+        if isinstance(layer, nn.Conv2d):
+            i += 1
+            names.append(f'conv_{i}')
+        elif isinstance(layer, nn.ReLU):
+            names.append(f'relu_{i}')
+        elif isinstance(layer, nn.MaxPool2d):
+            names.append(f'pool_{i}')
+        elif isinstance(layer, nn.BatchNorm2d):
+            names.append(f'bn_{i}')
+        else:
+            raise RuntimeError(f'Unrecognized layer: {layer.__class__.__name__}')
+    return names
+
+
+def _cfg_layer_names(cfg):
+    names, i = [], 0
+    for v in cfg:
+        if v == 'M':
+            names.append(f'pool_{i}')
+        else:
+            i += 1
+            names += [f'conv_{i}', f'relu_{i}']
+    return names
+
+
+# Layer names of the VGG19 features, without building them
+VGG19_LAYERS = _cfg_layer_names(vgg.cfgs['E'])
+
+
+def _vgg_state_dict(weights):
+    if weights == "random":
+        return None
+    if weights:
+        state = torch.load(weights, map_location="cpu", weights_only=True)
+    else:
+        state = torch.hub.load_state_dict_from_url(vgg.VGG19_Weights.IMAGENET1K_V1.url,
+                                                   map_location="cpu", progress=False)
+    # Full VGG19 checkpoints prefix the feature layers; the classifier is never needed
+    if any(k.startswith("features.") for k in state):
+        state = {k[len("features."):]: v for k, v in state.items() if k.startswith("features.")}
+    return state
+
+
+def vgg_features(layers=None, device=device, weights=None):
+    """
+    Shared, frozen VGG19 feature layers up to the deepest of layers
+    (default: every content and style layer used by run_style_transfer).
+
+    Loaded on first use and then kept for the process: the weights are
+    read-only (requires_grad off), so every request builds its loss model
+    around the same modules instead of copying them.
+    """
+    layers = layers or DEFAULT_CONTENT_LAYERS + DEFAULT_STYLE_LAYERS
+    weights = weights or VGG_WEIGHTS
+    depth = max(VGG19_LAYERS.index(name) for name in layers) + 1
+    key = (str(device), weights, depth)
+    with _vgg_lock:
+        if key not in _vgg:
+            if weights == "random":
+                torch.manual_seed(0)
+            features = vgg.make_layers(vgg.cfgs['E'])
+            state = _vgg_state_dict(weights)
+            if state is not None:
+                features.load_state_dict(state)
+            features = features[:depth].to(device).eval()
+            features.requires_grad_(False)
+            _vgg[key] = features
+        return _vgg[key]
+
+
+def network_key(cnn):
+    """
+    Short hash of a network's layers and weights, so cached style targets
+    are never reused with different weights.
+    """
+    if cnn not in _network_keys:
+        h = hashlib.sha256(repr(list(cnn.children())).encode("utf-8"))
+        for name, tensor in cnn.state_dict().items():
+            h.update(name.encode("utf-8"))
+            h.update(tensor.detach().cpu().contiguous().numpy().tobytes())
+        _network_keys[cnn] = h.hexdigest()[:16]
+    return _network_keys[cnn]
+
+
+def preload(layers=None, device=device, weights=None):
+    """
+    Load the shared network now, e.g. in the style-job forkserver so the
+    workers it forks share its pages instead of each loading their own.
+    """
+    return vgg_features(layers, device, weights)
+
+
+# Style-job workers fork from a forkserver that imports this module once
+# (see kolam.style_jobs); loading the network there lets them all share it
+if os.getenv("KOLAM_PRELOAD_STYLE_MODEL"):
+    preload()
+
+
+def __getattr__(name):
+    # `cnn` used to be loaded at import time; it is now the lazily loaded shared network
+    if name == "cnn":
+        return vgg_features()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def gram_matrix(input):
+    """
+    Per-sample Gram matrices (a, b, b) of a batch of (b, c, d) feature maps.
+    """
+    a, b, c, d = input.size()
+    features = input.view(a, b, c*d)
+    G = torch.bmm(features, features.transpose(1, 2))
+    return G.div(b*c*d)
+
 
 class ContentLoss(nn.Module):
+    """
+    Per-sample MSE to the target (losses, shape (batch,)); loss is their sum.
+    """
     def __init__(self, target):
         super().__init__()
         self.target = target.detach()
     def forward(self, x):
-        self.loss = nn.functional.mse_loss(x, self.target)
+        self.losses = (x - self.target).pow(2).flatten(1).mean(dim=1)
+        self.loss = self.losses.sum()
         return x
 
 class StyleLoss(nn.Module):
-    def __init__(self, target_feature):
+    """
+    Per-sample MSE between each sample's Gram matrix and one (b, b) target
+    shared by the whole batch; loss is the sum over samples.
+    """
+    def __init__(self, target_feature=None, target_gram=None):
         super().__init__()
-        self.target = self.gram_matrix(target_feature).detach()
+        if target_gram is None:
+            target_gram = self.gram_matrix(target_feature)[0]
+        self.target = target_gram.detach().reshape(target_gram.shape[-2:])
     def gram_matrix(self, input):
-        a, b, c, d = input.size()
-        features = input.view(a*b, c*d)
-        G = torch.mm(features, features.t())
-        return G.div(a*b*c*d)
+        return gram_matrix(input)
     def forward(self, x):
         G = self.gram_matrix(x)
-        self.loss = nn.functional.mse_loss(G, self.target)
+        self.losses = (G - self.target).pow(2).flatten(1).mean(dim=1)
+        self.loss = self.losses.sum()
         return x
 
 
+def style_grams(cnn, style_img, style_layers=DEFAULT_STYLE_LAYERS):
+    """
+    Gram-matrix targets {layer name: tensor} of a style image, from one
+    pass that stops at the deepest style layer.
+    """
+    grams = {}
+    x = style_img.detach()
+    with torch.no_grad():
+        for layer, name in zip(cnn.children(), layer_names(cnn)):
+            x = layer(x)
+            if name in style_layers:
+                grams[name] = gram_matrix(x)[0]
+            if len(grams) == len(style_layers):
+                break
+    return grams
+
+
 def get_style_model_and_losses(cnn, style_img, content_img,
-                               content_layers=['conv_4'],
-                               style_layers=['conv_1','conv_2','conv_3','conv_4','conv_5']):
-    import copy
-    cnn = copy.deepcopy(cnn)
+                               content_layers=DEFAULT_CONTENT_LAYERS,
+                               style_layers=DEFAULT_STYLE_LAYERS, grams=None):
+    """
+    Loss-instrumented model around the layers of cnn (None: the shared
+    network). The layers are reused, not copied; content and style targets
+    come from one forward pass each. With precomputed style Gram matrices
+    (grams, see style_grams and kolam.style_cache), style_img is not needed
+    and its pass is skipped.
+    """
+    cnn = vgg_features(content_layers + style_layers) if cnn is None else cnn
     content_losses = []
     style_losses = []
 
     model = nn.Sequential()
+    last = max(i for i, name in enumerate(layer_names(cnn)) if name in content_layers + style_layers)
+    content = content_img.detach()
+    style = style_img.detach() if grams is None else None
     i = 0
-    for layer in cnn.children():
+    for layer, name in zip(list(cnn.children())[:last + 1], layer_names(cnn)):
         if isinstance(layer, nn.Conv2d):
             i += 1
-            name = f'conv_{i}'
         elif isinstance(layer, nn.ReLU):
-            name = f'relu_{i}'
             layer = nn.ReLU(inplace=False)
-        elif isinstance(layer, nn.MaxPool2d):
-            name = f'pool_{i}'
-        elif isinstance(layer, nn.BatchNorm2d):
-            name = f'bn_{i}'
-        else:
-            raise RuntimeError(f'Unrecognized layer: {layer.__class__.__name__}')
 
         model.add_module(name, layer)
+        with torch.no_grad():
+            content = layer(content)
+            if style is not None:
+                style = layer(style)
 
         if name in content_layers:
-            target = model(content_img).detach()
-            content_loss = ContentLoss(target)
+            content_loss = ContentLoss(content)
             model.add_module(f"content_loss_{i}", content_loss)
             content_losses.append(content_loss)
 
         if name in style_layers:
-            target = model(style_img).detach()
-            style_loss = StyleLoss(target)
+            style_loss = StyleLoss(style) if grams is None else StyleLoss(target_gram=grams[name])
             model.add_module(f"style_loss_{i}", style_loss)
             style_losses.append(style_loss)
 
-    for i in range(len(model) - 1, -1, -1):
-        if isinstance(model[i], ContentLoss) or isinstance(model[i], StyleLoss):
-            break
-    model = model[:(i+1)]
-
     return model, style_losses, content_losses
 
 
 def run_style_transfer(content_img, style_img, num_steps=200,
-                       style_weight=1e6, content_weight=1):
-    input_img = content_img.clone()
-    model, style_losses, content_losses = get_style_model_and_losses(cnn, style_img, content_img)
+                       style_weight=1e6, content_weight=1, grams=None,
+                       progress=None, progress_every=10, tol=None, input_img=None, report=None):
+    """
+    progress, if given, is called every progress_every steps (and on the
+    last one) with a dict: step, num_steps, style_loss, content_loss.
+
+    - tol:       stop early once an optimizer step (up to 20 evaluations)
+                 lowers the loss by less than this fraction, for every
+                 sample of a batch
+    - input_img: starting image (default: a copy of the content image)
+    - report:    dict filled with steps, seconds, style_loss, content_loss
+                 (summed over the batch), converged (whether tol stopped it)
+                 and the per-sample sample_style_loss / sample_content_loss
+
+    content_img may be a batch (see run_style_transfer_batch): every sample
+    is matched against the same style targets and their losses are summed.
+    """
+    t0 = time.perf_counter()
+    input_img = (content_img if input_img is None else input_img).clone()
+    model, style_losses, content_losses = get_style_model_and_losses(None, style_img, content_img,
+                                                                     grams=grams)
     optimizer = optim.LBFGS([input_img.requires_grad_()], lr=0.1)
 
     print("Optimizing...")
     run = [0]
+    last = {}
+    sample_loss = [None]
+    previous = None
+    converged = False
 
     while run[0] <= num_steps:
         def closure():
@@ -140,14 +319,194 @@ def run_style_transfer(content_img, style_img, num_steps=200,
             content_score = sum(cl.loss for cl in content_losses)
             loss = style_score * style_weight + content_score * content_weight
             loss.backward()
+            sample_loss[0] = (sum(sl.losses for sl in style_losses) * style_weight
+                              + sum(cl.losses for cl in content_losses) * content_weight).detach()
 
             run[0] += 1
             if run[0] % 50 == 0:
                 print(f"Step {run[0]} | Style: {style_score.item():.4f} | Content: {content_score.item():.4f}")
+            last.update(step=run[0], num_steps=num_steps,
+                        style_loss=style_score.item(), content_loss=content_score.item())
+            if progress and run[0] % progress_every == 0:
+                progress(dict(last))
 
             return loss
 
         optimizer.step(closure)
         input_img.data.clamp_(0, 1)
 
+        # Per sample, so one sample converging early does not stop the others
+        current = sample_loss[0]
+        if tol is not None and previous is not None and \
+                bool((previous - current <= tol * previous.abs()).all()):
+            converged = True
+            break
+        previous = current
+
+    if progress and last["step"] % progress_every:
+        progress(dict(last))
+    if report is not None:
+        report.update(steps=last["step"], seconds=round(time.perf_counter() - t0, 3),
+                      style_loss=last["style_loss"], content_loss=last["content_loss"],
+                      converged=converged,
+                      sample_style_loss=sum(sl.losses for sl in style_losses).detach().tolist(),
+                      sample_content_loss=sum(cl.losses for cl in content_losses).detach().tolist())
     return input_img
+
+
+# ------------------ Coarse-to-Fine ------------------
+# (size, steps) per level; None is the target size. A level may overrun its
+# steps by up to one optimizer step (20 evaluations), like num_steps does
+PYRAMID_LEVELS = ((128, 100), (256, 40), (None, 20))
+PYRAMID_TOL = 1e-3
+
+
+def pyramid_levels(size, levels=PYRAMID_LEVELS):
+    """
+    (size, steps) of each level for a target size, smallest first; levels
+    not below the target are dropped, the target level always runs last.
+    """
+    resolved = [(s, steps) for s, steps in levels if s is not None and s < size]
+    return resolved + [(size, dict(levels).get(None, 0))]
+
+
+def _resize(img, size):
+    if img.shape[-1] == size and img.shape[-2] == size:
+        return img
+    downsample = size < img.shape[-1]
+    return nn.functional.interpolate(img, size=(size, size), mode="bilinear",
+                                     align_corners=False, antialias=downsample)
+
+
+def run_style_transfer_pyramid(content_img, style_img=None, levels=PYRAMID_LEVELS, tol=PYRAMID_TOL,
+                               grams=None, progress=None, **kwargs):
+    """
+    Coarse-to-fine run_style_transfer: each level optimizes at its size for
+    at most its steps (stopping early at tol), starting from the previous
+    level's result upsampled, so the costly full-size level only refines.
+
+    Style targets come from style_img resized to each level, or from grams,
+    a {size: Gram targets} dict (see kolam.style_cache). Returns (image,
+    report); the report has steps, seconds and final losses overall and
+    for every level.
+
+    progress gets run_style_transfer's dicts with step and num_steps
+    counted over all levels, plus level, levels, size, and work /
+    total_work: steps weighted by the level's pixels, which is what a step
+    costs, for ETAs. Totals are the steps run so far plus the budgets of
+    the levels left, so they shrink as levels stop early (and grow by a
+    level's overrun).
+    """
+    size = content_img.shape[-1]
+    plan = pyramid_levels(size, levels)
+    t0 = time.perf_counter()
+    report = {"levels": []}
+    output = None
+    done_steps = done_work = 0            # run in the finished levels
+    for i, (level_size, steps) in enumerate(plan):
+        later_steps = sum(n for _, n in plan[i + 1:])
+        later_work = sum(s * s * n for s, n in plan[i + 1:])
+
+        # Only called while this level runs, so it sees this iteration's values.
+        # A level that overruns its steps (see PYRAMID_LEVELS) extends its budget
+        def level_progress(p):
+            budget = max(steps, p["step"])
+            progress(dict(p, step=done_steps + p["step"], num_steps=done_steps + budget + later_steps,
+                          work=done_work + level_size ** 2 * p["step"],
+                          total_work=done_work + level_size ** 2 * budget + later_work,
+                          level=i, levels=len(plan), size=level_size))
+
+        level = {"size": level_size}
+        content = _resize(content_img, level_size)
+        start = None if output is None else _resize(output.detach(), level_size)
+        output = run_style_transfer(content, None if grams else _resize(style_img, level_size),
+                                    num_steps=steps, grams=grams[level_size] if grams else None,
+                                    progress=level_progress if progress else None,
+                                    tol=tol, input_img=start, report=level, **kwargs)
+        report["levels"].append(level)
+        done_steps += level["steps"]
+        done_work += level_size ** 2 * level["steps"]
+
+    final = report["levels"][-1]
+    report.update(steps=sum(level["steps"] for level in report["levels"]),
+                  seconds=round(time.perf_counter() - t0, 3),
+                  style_loss=final["style_loss"], content_loss=final["content_loss"])
+    return output, report
+
+
+# ------------------ Batches ------------------
+# Peak RAM for a batch, ~ fixed overhead + per sample: ACTIVATION_COPIES
+# floats per activation of the loss model (outputs kept for backward,
+# their gradients, temporaries) and the L-BFGS history (2 * LBFGS_HISTORY
+# copies of the image)
+ACTIVATION_COPIES = 3
+LBFGS_HISTORY = 100
+BATCH_MAX_BYTES = int(os.getenv("KOLAM_STYLE_BATCH_BYTES", 4 * 1024 ** 3))
+
+
+def sample_bytes(size, cnn=None):
+    """
+    Estimated RAM one sample of a size x size batch adds while optimizing.
+    """
+    cnn = vgg_features() if cnn is None else cnn
+    channels, side, floats = 3, size, 0
+    for layer in cnn.children():
+        if isinstance(layer, nn.Conv2d):
+            channels = layer.out_channels
+        elif isinstance(layer, nn.MaxPool2d):
+            side //= 2
+        floats += channels * side * side
+    image = 3 * size * size
+    return 4 * (ACTIVATION_COPIES * floats + (2 * LBFGS_HISTORY + 4) * image)
+
+
+def batch_chunks(n, size, max_bytes=None, cnn=None):
+    """
+    Samples per chunk so that an estimated chunk stays under max_bytes
+    (default KOLAM_STYLE_BATCH_BYTES); at least one.
+    """
+    per_sample = sample_bytes(size, cnn)
+    return max(1, min(n, (max_bytes or BATCH_MAX_BYTES) // per_sample))
+
+
+def run_style_transfer_batch(content_imgs, style_img=None, grams=None, max_bytes=None,
+                             report=None, **kwargs):
+    """
+    Style N content images (a list of 1 x 3 x S x S tensors or one
+    N x 3 x S x S batch, all the same size) with one style: the style
+    targets are computed once (or taken from grams), and the samples are
+    optimized together as one batch, split into chunks that keep the
+    estimated peak RAM under max_bytes. Returns N 1 x 3 x S x S outputs.
+
+    Other arguments are passed to run_style_transfer; report gets one
+    report per chunk ("chunks") plus per-sample losses over all of them.
+    With tol, a chunk stops once every one of its samples has converged.
+
+    Trade-off: a chunk shares one L-BFGS history and line search, so each
+    output depends on its chunk companions and matches neither a separate
+    run nor the same image in another chunk, and a chunk runs until its
+    slowest sample converges. What batching buys is fewer, larger VGG
+    passes, which pays off with several cores or a GPU; on one CPU core
+    it measured no faster than styling the images one at a time.
+    """
+    batch = torch.cat(list(content_imgs)) if isinstance(content_imgs, (list, tuple)) else content_imgs
+    n, size = batch.shape[0], batch.shape[-1]
+    if grams is None:
+        grams = style_grams(vgg_features(), style_img)
+    chunk = batch_chunks(n, size, max_bytes)
+
+    t0 = time.perf_counter()
+    outputs, chunks = [], []
+    for start in range(0, n, chunk):
+        chunk_report = {}
+        output = run_style_transfer(batch[start:start + chunk], None, grams=grams,
+                                    report=chunk_report, **kwargs)
+        outputs.extend(output.detach().split(1))
+        chunks.append(chunk_report)
+
+    if report is not None:
+        report.update(samples=n, chunk=chunk, chunks=chunks,
+                      seconds=round(time.perf_counter() - t0, 3),
+                      sample_style_loss=[l for c in chunks for l in c["sample_style_loss"]],
+                      sample_content_loss=[l for c in chunks for l in c["sample_content_loss"]])
+    return outputs
@@ -0,0 +1,152 @@
+"""
+Tiled, multi-process thresholding, skeletonization and dot detection for
+full-resolution scans.
+
+The grayscale image is cut into tile x tile cores. Each core is processed
+inside a window that extends halo pixels past it on every side, and only
+the core of the result is kept:
+
+    - the adaptive threshold reads an 11x11 neighbourhood, so any halo of
+      at least 5 pixels makes the core binary identical to a full pass;
+    - a thinning pass can only move information one pixel, so a core
+      pixel's skeleton depends on pixels at most 2 * (iterations) away, and
+      Zhang-Suen needs about one iteration per pixel of stroke half-width.
+      Each tile measures its thickest stroke (chessboard distance
+      transform) and asks for a wider window when the halo is too narrow,
+      up to max_halo. Solid regions wider than about max_halo (shadows or
+      a dark background under the global threshold, never pen strokes)
+      are thinned with the clamped halo and may differ near tile borders;
+    - each blob is kept by the one tile whose core holds its centre, so
+      blobs on tile borders are found once, and a halo wider than the
+      largest blob (maxArea 1000 px) means every kept blob was seen whole.
+
+The parent process only slices windows and pastes cores back; workers hold
+one window at a time and at most 2 * workers windows are in flight, so
+memory beyond the output arrays is bounded by the tile size.
+"""
+import itertools
+import math
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import cv2
+import numpy as np
+from skimage.morphology import skeletonize
+
+from kolam.analysis import _blob_detector, threshold_image
+
+DEFAULT_TILE = 1024
+# Smallest halo: covers the threshold window and the largest blob the detector accepts
+MIN_HALO = 48
+
+
+def tile_cores(h, w, tile=DEFAULT_TILE):
+    """
+    (y0, y1, x0, x1) of every core, row by row.
+    """
+    for y0, x0 in itertools.product(range(0, h, tile), range(0, w, tile)):
+        yield y0, min(y0 + tile, h), x0, min(x0 + tile, w)
+
+
+def _window(core, halo, h, w):
+    y0, y1, x0, x1 = core
+    return max(y0 - halo, 0), min(y1 + halo, h), max(x0 - halo, 0), min(x1 + halo, w)
+
+
+def _init_worker():
+    # Parallelism comes from the pool; OpenCV's own threads would only contend
+    cv2.setNumThreads(1)
+
+
+def required_halo(binary):
+    """
+    Halo wide enough for skeletonize to give a core the same result as a
+    full pass: two pixels per thinning iteration, plus the band at the
+    window edge where the adaptive threshold differs, plus a margin.
+    """
+    if not binary.any():
+        return 0
+    thickness = cv2.distanceTransform(binary, cv2.DIST_C, 3).max()
+    return 2 * int(math.ceil(thickness)) + 8
+
+
+def analyse_tile(window, offset, core, open_sides, threshold, halo, max_halo, detect):
+    """
+    Threshold, skeletonize and detect dots in one window.
+
+    Returns ("retry", halo) when its strokes need a wider halo, otherwise
+    ("ok", core, binary, skeleton, dots) with the core cut out and dots in
+    image coordinates.
+    """
+    binary = threshold_image(window, threshold)
+    needed = min(required_halo(binary), max_halo)
+    if needed > halo and open_sides:
+        return "retry", needed
+
+    wy, wx = offset
+    y0, y1, x0, x1 = core
+    inner = (slice(y0 - wy, y1 - wy), slice(x0 - wx, x1 - wx))
+    skeleton = skeletonize(binary // 255)[inner]
+
+    dots = []
+    if detect:
+        for kp in _blob_detector().detect(binary):
+            x, y = kp.pt[0] + wx, kp.pt[1] + wy
+            if y0 <= y < y1 and x0 <= x < x1:
+                dots.append((x, y))
+    return "ok", core, binary[inner], skeleton, dots
+
+
+def tiled_analysis(gray, threshold="adaptive", tile=DEFAULT_TILE, halo=MIN_HALO,
+                   max_halo=None, workers=None, detect_dots=True):
+    """
+    (binary, skeleton, dots) for a full-resolution grayscale image, matching
+    a single pass of threshold_image + skeletonize + blob detection (the
+    same dots, in row-major order). max_halo defaults to the tile size.
+    """
+    h, w = gray.shape
+    binary = np.zeros((h, w), dtype=np.uint8)
+    skeleton = np.zeros((h, w), dtype=bool)
+    dots = []
+    workers = workers or os.cpu_count() or 1
+    cores = list(tile_cores(h, w, tile))
+    halos = dict.fromkeys(cores, max(halo, MIN_HALO))
+    max_halo = max(max_halo or tile, MIN_HALO)
+
+    def job(core):
+        wy0, wy1, wx0, wx1 = _window(core, halos[core], h, w)
+        open_sides = (wy0, wx0) != (0, 0) or (wy1, wx1) != (h, w)
+        window = np.ascontiguousarray(gray[wy0:wy1, wx0:wx1])
+        return (window, (wy0, wx0), core, open_sides, threshold, halos[core], max_halo, detect_dots)
+
+    def collect(result, core):
+        if result[0] == "retry":
+            halos[core] = result[1]
+            return False
+        _, (y0, y1, x0, x1), b, s, d = result
+        binary[y0:y1, x0:x1] = b
+        skeleton[y0:y1, x0:x1] = s
+        dots.extend(d)
+        return True
+
+    if workers == 1 or len(cores) == 1:
+        for core in cores:
+            while not collect(analyse_tile(*job(core)), core):
+                pass
+    else:
+        queue = list(reversed(cores))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            pending = {}
+            while queue or pending:
+                while queue and len(pending) < 2 * workers:
+                    core = queue.pop()
+                    pending[pool.submit(analyse_tile, *job(core))] = core
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    core = pending.pop(future)
+                    if not collect(future.result(), core):
+                        queue.append(core)
+
+    # Row-major, so the order does not depend on how tiles finished
+    dots.sort(key=lambda p: (p[1], p[0]))
+    return binary, skeleton, dots
@@ -0,0 +1,317 @@
+"""
+Streamed SVG / PDF export for generated kolams.
+
+Both writers consume an iterable of geometry dicts (see main.kolam_geometry)
+and yield the document piece by piece, so a large grid never has to sit in
+memory as a whole. Repeated shapes are defined once: weave arcs and dots
+become <use> references in SVG and Form XObjects in PDF, and arcs are true
+arc commands (SVG "A", cubic Béziers in PDF).
+"""
+import zlib
+
+import numpy as np
+
+from kolam.raster import AXES_INCHES, PAD_INCHES, parse_color
+
+PT_PER_INCH = 72.0
+
+
+def _fmt(v, digits=2):
+    text = f"{v:.{digits}f}".rstrip("0").rstrip(".")
+    return "0" if text in ("", "-0") else text
+
+
+def _hex(color):
+    r, g, b = parse_color(color)
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+
+def _page_transform(bounds):
+    """
+    Data -> points: returns (scale, x0, y0, pad, width, height), framed like
+    the raster backend (4.62in on the long side plus 0.1in padding).
+    """
+    x0, x1, y0, y1 = bounds
+    dx = max(x1 - x0, 1e-12)
+    dy = max(y1 - y0, 1e-12)
+    scale = AXES_INCHES * PT_PER_INCH / max(dx, dy)
+    pad = PAD_INCHES * PT_PER_INCH
+    return scale, x0, y0, pad, dx * scale + 2 * pad, dy * scale + 2 * pad
+
+
+def _arc_sweep(t1, t2):
+    # matplotlib's Arc convention (see main.arc_spans)
+    span = (t2 - t1) % 360.0
+    if span == 0 and t2 != t1:
+        span = 360.0
+    return span
+
+
+def _shape_keys(arcs):
+    """
+    Unique (r, theta1, theta2) arc shapes and the index of each arc's shape.
+    """
+    if not len(arcs):
+        return np.empty((0, 3)), np.empty(0, dtype=int)
+    return np.unique(np.round(arcs[:, 2:5], 9), axis=0, return_inverse=True)
+
+
+# ---------------- SVG ----------------
+def _svg_arc_path(r, t1, t2):
+    """
+    Path data for an arc centred on the origin, in data (y-up) units.
+    """
+    span = _arc_sweep(t1, t2)
+
+    def point(theta):
+        a = np.radians(theta)
+        return _fmt(r * np.cos(a), 5), _fmt(r * np.sin(a), 5)
+
+    # A single "A" command cannot draw a closed circle, so split long sweeps in two
+    pieces = 2 if span > 180 else 1
+    step = span / pieces
+    x, y = point(t1)
+    d = [f"M{x} {y}"]
+    for k in range(1, pieces + 1):
+        x, y = point(t1 + step * k)
+        d.append(f"A{_fmt(r, 5)} {_fmt(r, 5)} 0 0 1 {x} {y}")
+    return "".join(d)
+
+
+def _rows(xy):
+    """
+    Group shapes by their y coordinate: yields (y, indices) per row.
+    """
+    if not len(xy):
+        return
+    ys = np.round(xy[:, 1], 9)
+    order = np.argsort(ys, kind="stable")
+    bounds = np.flatnonzero(np.diff(ys[order])) + 1
+    for idx in np.split(order, bounds):
+        yield ys[idx[0]], idx
+
+
+def iter_svg(chunks, bounds, line_color="black", dot_color="black", bg_color="white",
+             line_width=1.5):
+    """
+    Yield an SVG document (str pieces) for the geometry chunks.
+
+    Everything is drawn in data coordinates under one transform. Each arc
+    shape and dot is a <defs> entry placed with <use>, and each distinct row
+    of arcs or dots is defined once as a group and reused with <use y=...>,
+    so a periodic weave costs a few bytes per row rather than per cell.
+    """
+    scale, x0, y0, pad, width, height = _page_transform(bounds)
+    tx = pad - x0 * scale
+    ty = height - pad + y0 * scale
+
+    yield ('<?xml version="1.0" encoding="UTF-8"?>\n'
+           f'<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" '
+           f'width="{_fmt(width)}pt" height="{_fmt(height)}pt" '
+           f'viewBox="0 0 {_fmt(width)} {_fmt(height)}">\n'
+           f'<rect width="100%" height="100%" fill="{_hex(bg_color)}"/>\n'
+           f'<g transform="matrix({_fmt(scale, 6)} 0 0 {_fmt(-scale, 6)} {_fmt(tx, 4)} {_fmt(ty, 4)})" '
+           f'fill="none" stroke="{_hex(line_color)}" stroke-width="{_fmt(line_width / scale, 6)}">\n')
+
+    shape_ids = {}
+    row_ids = {}
+
+    def use(ref, x=None, y=None):
+        pos = (f' x="{_fmt(x, 5)}"' if x else "") + (f' y="{_fmt(y, 5)}"' if y else "")
+        return f'<use xlink:href="#{ref}"{pos}/>'
+
+    def define_shape(key, element):
+        if key in shape_ids:
+            return shape_ids[key], ""
+        shape_ids[key] = f"s{len(shape_ids)}"
+        return shape_ids[key], f'<defs>{element.format(id=shape_ids[key])}</defs>\n'
+
+    def place_rows(xy, refs, kind):
+        # refs[k] is the <defs> id for shape k; rows with the same content share a group
+        out = []
+        for y, idx in _rows(xy):
+            order = idx[np.argsort(xy[idx, 0], kind="stable")]
+            key = (kind,) + tuple((round(float(xy[k, 0]), 9), refs[k]) for k in order)
+            if key not in row_ids:
+                row_ids[key] = f"r{len(row_ids)}"
+                body = "".join(use(refs[k], xy[k, 0]) for k in order)
+                out.append(f'<defs><g id="{row_ids[key]}">{body}</g></defs>\n')
+            out.append(use(row_ids[key], None, y) + "\n")
+        return out
+
+    for geom in chunks:
+        parts = []
+        for line in geom["polylines"]:
+            pts = " ".join(f"{_fmt(x, 5)},{_fmt(y, 5)}" for x, y in line)
+            parts.append(f'<polyline points="{pts}"/>\n')
+
+        arcs = geom["arcs"]
+        if len(arcs):
+            shapes, which = _shape_keys(arcs)
+            refs = []
+            for r, t1, t2 in shapes:
+                ref, defs = define_shape(("arc", r, t1, t2),
+                                         f'<path id="{{id}}" d="{_svg_arc_path(r, t1, t2)}"/>')
+                refs.append(ref)
+                parts.append(defs)
+            parts += place_rows(arcs[:, :2], [refs[k] for k in which], "arc")
+
+        for cx, cy, r in geom["circles"]:
+            parts.append(f'<circle cx="{_fmt(cx, 5)}" cy="{_fmt(cy, 5)}" r="{_fmt(r, 5)}"/>\n')
+
+        # Dots: filled, with matplotlib's 1pt same-colour edge folded into the radius
+        dots = geom["dots"]
+        if len(dots):
+            refs = []
+            for r in dots[:, 2]:
+                ref, defs = define_shape(("dot", r),
+                                         f'<circle id="{{id}}" r="{_fmt(r + 0.5 / scale, 6)}" '
+                                         f'fill="{_hex(dot_color)}" stroke="none"/>')
+                refs.append(ref)
+                if defs:
+                    parts.append(defs)
+            parts += place_rows(dots[:, :2], refs, "dot")
+        yield "".join(parts)
+
+    yield "</g>\n</svg>\n"
+
+
+# ---------------- PDF ----------------
+def _bezier_arc(r, t1, t2):
+    """
+    PDF path operators for an arc centred on the origin (y up), as cubic
+    Béziers of at most 90 degrees each.
+    """
+    span = _arc_sweep(t1, t2)
+    pieces = max(1, int(np.ceil(span / 90.0 - 1e-9)))
+    step = np.radians(span / pieces)
+    k = 4.0 / 3.0 * np.tan(step / 4.0)
+    a = np.radians(t1)
+    ops = [f"{_fmt(r * np.cos(a))} {_fmt(r * np.sin(a))} m"]
+    for _ in range(pieces):
+        b = a + step
+        c1 = (r * (np.cos(a) - k * np.sin(a)), r * (np.sin(a) + k * np.cos(a)))
+        c2 = (r * (np.cos(b) + k * np.sin(b)), r * (np.sin(b) - k * np.cos(b)))
+        ops.append(f"{_fmt(c1[0])} {_fmt(c1[1])} {_fmt(c2[0])} {_fmt(c2[1])} "
+                   f"{_fmt(r * np.cos(b))} {_fmt(r * np.sin(b))} c")
+        a = b
+    return " ".join(ops)
+
+
+def _rgb_op(color, op):
+    r, g, b = parse_color(color)
+    return f"{r / 255:.3f} {g / 255:.3f} {b / 255:.3f} {op}"
+
+
+def iter_pdf(chunks, bounds, line_color="black", dot_color="black", bg_color="white",
+             line_width=1.5):
+    """
+    Yield a single-page PDF (bytes pieces) for the geometry chunks.
+
+    The page content is written first as a Flate stream; repeated arc and dot
+    shapes are collected as Form XObjects while streaming and written after
+    it, with the cross-reference table built from running byte offsets.
+    """
+    scale, x0, y0, pad, width, height = _page_transform(bounds)
+    offsets = {}
+    pos = 0
+
+    def emit(data):
+        nonlocal pos
+        pos += len(data)
+        return data
+
+    def begin_obj(num):
+        offsets[num] = pos
+        return emit(f"{num} 0 obj\n".encode())
+
+    # Fixed object numbers; XObjects are numbered from 7 upwards as they appear
+    catalog, pages, page, content, length, resources = 1, 2, 3, 4, 5, 6
+    next_obj = [7]
+    xobjects = {}      # name -> (obj number, content operators, bbox radius)
+
+    def xobject(key, build):
+        if key not in xobjects:
+            xobjects[key] = (f"X{len(xobjects)}", next_obj[0]) + build()
+            next_obj[0] += 1
+        return xobjects[key][0]
+
+    yield emit(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    yield begin_obj(content)
+    yield emit(f"<< /Length {length} 0 R /Filter /FlateDecode >>\nstream\n".encode())
+
+    z = zlib.compressobj(6)
+    stream_len = 0
+
+    def put(text):
+        nonlocal stream_len
+        data = z.compress(text.encode())
+        stream_len += len(data)
+        return emit(data) if data else b""
+
+    yield put(f"{_rgb_op(bg_color, 'rg')} 0 0 {_fmt(width)} {_fmt(height)} re f\n"
+              f"{_rgb_op(line_color, 'RG')} {_rgb_op(dot_color, 'rg')} {_fmt(line_width)} w\n")
+
+    def px(x):
+        return pad + (x - x0) * scale
+
+    def py(y):
+        return pad + (y - y0) * scale
+
+    for geom in chunks:
+        ops = []
+        for line in geom["polylines"]:
+            ops.append(f"{_fmt(px(line[0, 0]))} {_fmt(py(line[0, 1]))} m " +
+                       " ".join(f"{_fmt(px(x))} {_fmt(py(y))} l" for x, y in line[1:]) + " S")
+
+        shapes, which = _shape_keys(geom["arcs"])
+        names = [xobject(("arc",) + tuple(s),
+                         lambda s=s: (_bezier_arc(s[0] * scale, s[1], s[2]) + " S", s[0] * scale))
+                 for s in shapes]
+        for (cx, cy), k in zip(geom["arcs"][:, :2], which):
+            ops.append(f"q 1 0 0 1 {_fmt(px(cx))} {_fmt(py(cy))} cm /{names[k]} Do Q")
+
+        for cx, cy, r in geom["circles"]:
+            ops.append(f"q 1 0 0 1 {_fmt(px(cx))} {_fmt(py(cy))} cm "
+                       f"{_bezier_arc(r * scale, 0.0, 360.0)} S Q")
+
+        for cx, cy, r in geom["dots"]:
+            rr = r * scale + 0.5
+            name = xobject(("dot", r), lambda rr=rr: (_bezier_arc(rr, 0.0, 360.0) + " f", rr))
+            ops.append(f"q 1 0 0 1 {_fmt(px(cx))} {_fmt(py(cy))} cm /{name} Do Q")
+        if ops:
+            yield put("\n".join(ops) + "\n")
+
+    tail = z.flush()
+    stream_len += len(tail)
+    yield emit(tail)
+    yield emit(b"\nendstream\nendobj\n")
+
+    yield begin_obj(length)
+    yield emit(f"{stream_len}\nendobj\n".encode())
+
+    for name, num, body, reach in xobjects.values():
+        stream = body.encode()
+        bbox = " ".join(_fmt(v) for v in (-reach - line_width, -reach - line_width,
+                                          reach + line_width, reach + line_width))
+        yield begin_obj(num)
+        yield emit(f"<< /Type /XObject /Subtype /Form /BBox [{bbox}] /Length {len(stream)} >>\n"
+                   f"stream\n".encode() + stream + b"\nendstream\nendobj\n")
+
+    xobject_refs = " ".join(f"/{name} {num} 0 R" for name, num, _, _ in xobjects.values())
+    yield begin_obj(resources)
+    yield emit(f"<< /XObject << {xobject_refs} >> >>\nendobj\n".encode())
+    yield begin_obj(page)
+    yield emit(f"<< /Type /Page /Parent {pages} 0 R /MediaBox [0 0 {_fmt(width)} {_fmt(height)}] "
+               f"/Resources {resources} 0 R /Contents {content} 0 R >>\nendobj\n".encode())
+    yield begin_obj(pages)
+    yield emit(f"<< /Type /Pages /Kids [{page} 0 R] /Count 1 >>\nendobj\n".encode())
+    yield begin_obj(catalog)
+    yield emit(f"<< /Type /Catalog /Pages {pages} 0 R >>\nendobj\n".encode())
+
+    count = next_obj[0]
+    xref = pos
+    lines = [f"xref\n0 {count}\n", "0000000000 65535 f \n"]
+    lines += [f"{offsets[n]:010d} 00000 n \n" for n in range(1, count)]
+    yield emit("".join(lines).encode())
+    yield emit(f"trailer\n<< /Size {count} /Root {catalog} 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
@@ -0,0 +1,139 @@
+"""
+Weave style registry with array-compiled style tables.
+
+A weave style decides which arcs each grid cell (i, j) gets. Styles are
+declared as rule tables (WeaveRule) that evaluate the whole index grid in
+one NumPy gather. Plain callables f(i, j) -> [(theta1, theta2), ...] still
+work: they are wrapped in LambdaStyle, which evaluates them cell by cell.
+Both kinds stay callable per cell, so existing code that calls
+weave_styles[name](i, j) is unaffected.
+"""
+import numpy as np
+
+# Named cell selectors -> (a, b) in a*i + b*j
+SELECTORS = {
+    "const": (0, 0),
+    "i": (1, 0),
+    "j": (0, 1),
+    "i+j": (1, 1),
+    "i-j": (1, -1),
+}
+
+weave_styles = {}
+
+
+class WeaveRule:
+    """
+    Declarative weave style.
+
+    on:     selector name from SELECTORS or an (a, b) pair; the cell value is a*i + b*j
+    cases:  list of arc lists; cell value % mod picks the case
+    mod:    defaults to len(cases); with no cases it must be given (every
+            cell is then empty)
+    rotate: optional (selector, degrees): adds (selector_value * degrees) % 360
+            to both angles of every arc in the cell
+    """
+    def __init__(self, cases, on="i+j", mod=None, rotate=None):
+        self.on = SELECTORS[on] if isinstance(on, str) else tuple(on)
+        self.cases = [[(float(t1), float(t2)) for t1, t2 in case] for case in cases]
+        self.mod = int(mod or len(self.cases))
+        if self.mod < 1:
+            raise ValueError("a weave rule needs at least one case or a positive mod")
+        if rotate is not None:
+            sel, step = rotate
+            rotate = (SELECTORS[sel] if isinstance(sel, str) else tuple(sel), float(step))
+        self.rotate = rotate
+
+        # Padded (mod, max_arcs, 2) angle table plus per-case arc counts
+        width = max([len(c) for c in self.cases] + [1])
+        self.table = np.zeros((self.mod, width, 2))
+        self.counts = np.zeros(self.mod, dtype=int)
+        for k in range(self.mod):
+            case = self.cases[k % len(self.cases)] if self.cases else []
+            self.counts[k] = len(case)
+            if case:
+                self.table[k, :len(case)] = case
+
+    def _offset(self, i, j):
+        if self.rotate is None:
+            return 0.0
+        (a, b), step = self.rotate
+        return np.mod((a * i + b * j) * step, 360.0)
+
+    def __call__(self, i, j):
+        a, b = self.on
+        k = (a * i + b * j) % self.mod
+        off = self._offset(i, j)
+        return [(t1 + off, t2 + off) for t1, t2 in self.table[k, :self.counts[k]]]
+
+    def arcs(self, I, J):
+        """
+        Vectorized evaluation over flat index arrays I, J.
+
+        Returns (cell, theta1, theta2): for every arc, the position of its
+        cell in I/J and its angles, in per-cell order.
+        """
+        I = np.asarray(I); J = np.asarray(J)
+        a, b = self.on
+        k = np.mod(a * I + b * J, self.mod)
+        angles = self.table[k]                                     # (n, width, 2)
+        valid = np.arange(self.table.shape[1])[None, :] < self.counts[k][:, None]
+        if self.rotate is not None:
+            angles = angles + self._offset(I, J)[:, None, None]
+        cell = np.broadcast_to(np.arange(len(I))[:, None], valid.shape)
+        return cell[valid], angles[..., 0][valid], angles[..., 1][valid]
+
+
+class LambdaStyle:
+    """
+    Adapter for a plain per-cell style function.
+    """
+    def __init__(self, func):
+        self.func = func
+
+    def __call__(self, i, j):
+        return self.func(i, j)
+
+    def arcs(self, I, J):
+        cells, t1s, t2s = [], [], []
+        for n, (i, j) in enumerate(zip(np.asarray(I).tolist(), np.asarray(J).tolist())):
+            for t1, t2 in self.func(i, j):
+                cells.append(n); t1s.append(t1); t2s.append(t2)
+        return (np.array(cells, dtype=int), np.array(t1s, dtype=float),
+                np.array(t2s, dtype=float))
+
+
+def compile_style(style):
+    """
+    Anything usable as a weave style -> an object with .arcs(I, J).
+    """
+    if isinstance(style, (WeaveRule, LambdaStyle)):
+        return style
+    if isinstance(style, dict):
+        return WeaveRule(**style)
+    if callable(style):
+        return LambdaStyle(style)
+    raise TypeError(f"not a weave style: {style!r}")
+
+
+def register_weave_style(name, style=None, **rule):
+    """
+    Register a style under name: either a ready style (WeaveRule, a dict of
+    WeaveRule arguments, or a callable f(i, j)), or the rule given as
+    keyword arguments, e.g.
+
+        register_weave_style("thirds", on="i+j", cases=[[(0, 90)], [(90, 180)], []])
+    """
+    try:
+        weave_styles[name] = compile_style(style if style is not None else rule)
+    except ValueError as exc:
+        raise ValueError(f"weave style {name!r}: {exc}") from None
+    return weave_styles[name]
+
+
+def get_weave_style(name, default="classic"):
+    """
+    Compiled style for name, falling back to default for unknown names.
+    Entries assigned straight into weave_styles (e.g. lambdas) are adapted here.
+    """
+    return compile_style(weave_styles.get(name, weave_styles.get(default)))
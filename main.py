@@ -4,10 +4,18 @@ import matplotlib.pyplot as plt
 from matplotlib.patches import Arc, Circle
 import matplotlib
 matplotlib.use("Agg")   # ✅ Use a headless backend (no GUI)
+import functools
 import io
+import os
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.patches import Arc, Circle
+from matplotlib.collections import EllipseCollection, LineCollection
+from kolam.fractal import fractal_polylines
+from kolam.scene import SHAPE_PARAMS, KolamScene
+from kolam.raster import data_bounds, render_tiled
+from kolam.vector import iter_pdf, iter_svg
+from kolam.weave import get_weave_style, register_weave_style, weave_styles
 
 
 # ---------------- Base Dot Grid ----------------
@@ -22,30 +30,31 @@ def draw_dot_grid(ax, rows, cols, spacing=1.0, dot_radius=0.05, dot_color="black
 
 # ---------------- Weave Kolam ----------------
 # ---- Weave styles registry ----
-weave_styles = {
-    "classic": lambda i,j: [(180,270),(0,90)] if (i+j)%2==0 else [(90,180),(270,360)],
-    "checkerboard": lambda i,j: [(0,90),(180,270)] if (i+j)%2==0 else [(90,180),(270,360)],
-    "lines": lambda i,j: [(0,180)] if (i+j)%2==0 else [(180,360)],
-    "diagonal": lambda i,j: [(45,135)] if (i+j)%2==0 else [(225,315)],
-    "cross": lambda i,j: [(0,180),(90,270)],
-    "zigzag": lambda i,j: [(0,90),(270,360)] if (i%2==0) else [(90,180),(180,270)],
-    "concentric": lambda i,j: [(0, 360)] if (i+j)%2==0 else [(45,135),(225,315)],
-    "spiral-weave": lambda i,j: [(0+(i*30)%360, 180+(i*30)%360)],
-    "horizontal": lambda i,j: [(0,180)],
-    "vertical": lambda i,j: [(90,270)],
-    "diamond": lambda i,j: [(45,135),(225,315)] if (i+j)%2==0 else [(135,225),(315,45)],
-    "circle-grid": lambda i,j: [(0,360)] if (i+j)%2==0 else [],
-    "star": lambda i,j: [(0,90),(90,180),(180,270),(270,360)] if (i+j)%2==0 else [],
-    "offset-diagonal": lambda i,j: [(30,150)] if (i+j)%2==0 else [(210,330)],
-    "wave": lambda i,j: [(0,180)] if i%2==0 else [(180,360)],
-    "petal": lambda i,j: [(0,90),(90,180),(180,270),(270,360)],
-}
+# Each style is a rule table: the selector `on` (a*i + b*j) modulo the number
+# of cases picks the arcs of cell (i, j); `rotate` turns them by a per-cell
+# angle. Plain functions f(i, j) can be registered too (see kolam/weave.py).
+register_weave_style("classic", on="i+j", cases=[[(180,270),(0,90)], [(90,180),(270,360)]])
+register_weave_style("checkerboard", on="i+j", cases=[[(0,90),(180,270)], [(90,180),(270,360)]])
+register_weave_style("lines", on="i+j", cases=[[(0,180)], [(180,360)]])
+register_weave_style("diagonal", on="i+j", cases=[[(45,135)], [(225,315)]])
+register_weave_style("cross", on="const", cases=[[(0,180),(90,270)]])
+register_weave_style("zigzag", on="i", cases=[[(0,90),(270,360)], [(90,180),(180,270)]])
+register_weave_style("concentric", on="i+j", cases=[[(0,360)], [(45,135),(225,315)]])
+register_weave_style("spiral-weave", on="const", cases=[[(0,180)]], rotate=("i", 30))
+register_weave_style("horizontal", on="const", cases=[[(0,180)]])
+register_weave_style("vertical", on="const", cases=[[(90,270)]])
+register_weave_style("diamond", on="i+j", cases=[[(45,135),(225,315)], [(135,225),(315,45)]])
+register_weave_style("circle-grid", on="i+j", cases=[[(0,360)], []])
+register_weave_style("star", on="i+j", cases=[[(0,90),(90,180),(180,270),(270,360)], []])
+register_weave_style("offset-diagonal", on="i+j", cases=[[(30,150)], [(210,330)]])
+register_weave_style("wave", on="i", cases=[[(0,180)], [(180,360)]])
+register_weave_style("petal", on="const", cases=[[(0,90),(90,180),(180,270),(270,360)]])
 
 def kolam_weave(ax, rows=9, cols=9, spacing=1.0,
                 line_color="black", line_width=1.5, style="classic"):
     xs = np.arange(cols) * spacing
     ys = np.arange(rows) * spacing
-    style_func = weave_styles.get(style, weave_styles["classic"])
+    style_func = get_weave_style(style)
 
     for i in range(cols-1):
         for j in range(rows-1):
@@ -61,6 +70,31 @@ def kolam_weave(ax, rows=9, cols=9, spacing=1.0,
     ax.set_xlim(-spacing, (cols-1)*spacing + spacing)
     ax.set_ylim(-spacing, (rows-1)*spacing + spacing)
 
+# ---------------- Vectorized Weave ----------------
+def weave_arc_table(rows, cols, style="classic", cells=None):
+    """
+    Evaluate a weave style over the whole cell grid, or over the cell window
+    cells=(i0, i1, j0, j1) (half-open, clipped to the grid).
+
+    Returns flat arrays (i, j, theta1, theta2), one entry per arc, in the
+    same order kolam_weave draws them.
+    """
+    i0, i1, j0, j1 = cells or (0, cols-1, 0, rows-1)
+    I, J = np.meshgrid(np.arange(max(i0, 0), min(i1, cols-1)),
+                       np.arange(max(j0, 0), min(j1, rows-1)), indexing="ij")
+    I, J = I.ravel(), J.ravel()
+    cell, t1, t2 = get_weave_style(style).arcs(I, J)
+    return I[cell], J[cell], t1.astype(float), t2.astype(float)
+
+def arc_spans(theta1, theta2):
+    """
+    Sweep of each arc in degrees, following matplotlib's Arc convention:
+    theta2 is wrapped to lie after theta1, and equal-mod-360 angles that
+    differ give a full circle.
+    """
+    span = np.mod(theta2 - theta1, 360.0)
+    return np.where((span == 0) & (theta2 != theta1), 360.0, span)
+
 # ---------------- Radial Kolam ----------------
 def kolam_radial(ax, n_petals=8, rings=3, radius=1.0, line_color="black", line_width=1.5, ring_scale=0.8):
     theta = np.linspace(0, 2*np.pi, 1000)
@@ -71,17 +105,10 @@ def kolam_radial(ax, n_petals=8, rings=3, radius=1.0, line_color="black", line_w
 
 # ---------------- Fractal Kolam ----------------
 def kolam_fractal(ax, depth=4, size=1.0, line_color="black", line_width=1.0):
-    def draw_square(x,y,s,d):
-        ax.plot([x-s,x+s,x+s,x-s,x-s],
-                [y-s,y-s,y+s,y+s,y-s],
-                color=line_color, lw=line_width)
-        if d>0:
-            new_s = s/2
-            draw_square(x+s,y,new_s,d-1)
-            draw_square(x-s,y,new_s,d-1)
-            draw_square(x,y+s,new_s,d-1)
-            draw_square(x,y-s,new_s,d-1)
-    draw_square(0,0,size,depth)
+    # Every visible square in one collection (see kolam/fractal.py)
+    squares = fractal_polylines(depth, size)
+    ax.add_collection(LineCollection(squares, colors=line_color, linewidths=line_width))
+    ax.autoscale_view()
 
 # ---------------- Spiral Kolam ----------------
 def kolam_spiral(ax, turns=6, spacing=0.3, line_color="black", line_width=1.5):
@@ -111,66 +138,355 @@ def kolam_flower(ax, petals=8, radius=1.0, line_color="black", line_width=1.5):
     r = radius * np.sin(petals*theta)
     ax.plot(r*np.cos(theta), r*np.sin(theta), color=line_color, lw=line_width)
 
-# ---------------- API: Generate Image ----------------
-def generate_kolam_image(pattern="weave",
-                         rows=9, cols=9,
-                         n_petals=8, rings=3,
-                         spacing=1.0, radius=1.5,
-                         dot_grid=True, dot_radius=0.05,
-                         line_color="black", dot_color="black", bg_color="white",
-                         line_width=1.5, weave_style="classic",
-                         fractal_depth=3, ring_scale=0.8,
-                         turns=6, layers=5, petals=8):
-    fig, ax = plt.subplots(figsize=(6,6), facecolor=bg_color)
+# ---------------- Geometry ----------------
+# Backend-neutral description of a pattern: the same shapes the kolam_*
+# functions draw, as plain arrays.
+#   polylines: list of (n, 2) vertex arrays, or one (m, n, 2) array
+#   arcs:      (n, 5) rows of cx, cy, r, theta1, theta2 (degrees)
+#   circles:   (n, 3) rows of cx, cy, r (outlined)
+#   dots:      (n, 3) rows of cx, cy, r (filled, dot_color)
+#   bounds:    (xmin, xmax, ymin, ymax) when the pattern fixes its view, else None
+def _empty_geometry():
+    return {"polylines": [], "arcs": np.empty((0, 5)), "circles": np.empty((0, 3)),
+            "dots": np.empty((0, 3)), "bounds": None}
 
-    if pattern == "weave":
-        kolam_weave(ax, rows, cols, spacing, line_color, line_width, weave_style)
-        if dot_grid:
-            draw_dot_grid(ax, rows, cols, spacing, dot_radius, dot_color)
+def weave_geometry(rows=9, cols=9, spacing=1.0, style="classic",
+                   dot_grid=True, dot_radius=0.05, window=None):
+    """
+    Weave geometry; with window=(xmin, xmax, ymin, ymax) only the arcs and
+    dots that can reach into that data-space rectangle are produced.
+    """
+    geom = _empty_geometry()
+    cells = None
+    if window is not None:
+        wx0, wx1, wy0, wy1 = window
+        reach = spacing/2 + dot_radius
+        cells = (int(np.floor((wx0 - reach) / spacing)), int(np.ceil((wx1 + reach) / spacing)),
+                 int(np.floor((wy0 - reach) / spacing)), int(np.ceil((wy1 + reach) / spacing)))
+    i, j, t1, t2 = weave_arc_table(rows, cols, style, cells)
+    geom["arcs"] = np.column_stack([i*spacing + spacing/2, j*spacing + spacing/2,
+                                    np.full(len(i), spacing/2), t1, t2])
+    if dot_grid:
+        i0, i1, j0, j1 = cells or (0, cols, 0, rows)
+        xs = np.arange(max(i0, 0), min(i1 + 1, cols)) * spacing
+        ys = np.arange(max(j0, 0), min(j1 + 1, rows)) * spacing
+        X, Y = np.meshgrid(xs, ys)
+        geom["dots"] = np.column_stack([X.ravel(), Y.ravel(), np.full(X.size, dot_radius)])
+    geom["bounds"] = (-spacing, (cols-1)*spacing + spacing, -spacing, (rows-1)*spacing + spacing)
+    return geom
 
-    elif pattern == "radial":
-        kolam_radial(ax, n_petals, rings, radius, line_color, line_width, ring_scale)
+def radial_geometry(n_petals=8, rings=3, radius=1.0, ring_scale=0.8):
+    geom = _empty_geometry()
+    theta = np.linspace(0, 2*np.pi, 1000)
+    for m in range(1, rings+1):
+        k = n_petals + m
+        r = radius * (1 + 0.3*np.cos(k*theta)) * (ring_scale**(m-1))
+        geom["polylines"].append(np.column_stack([r*np.cos(theta), r*np.sin(theta)]))
+    return geom
 
-    elif pattern == "fractal":
-        kolam_fractal(ax, fractal_depth, radius, line_color, line_width)
+def fractal_geometry(depth=4, size=1.0, pixel=None):
+    # pixel: see fractal_squares; 0 keeps every square (vector output)
+    geom = _empty_geometry()
+    geom["polylines"] = fractal_polylines(depth, size, pixel)
+    return geom
 
-    elif pattern == "spiral":
-        kolam_spiral(ax, turns=turns, spacing=spacing, line_color=line_color, line_width=line_width)
+def spiral_geometry(turns=6, spacing=0.3):
+    geom = _empty_geometry()
+    theta = np.linspace(0, 2*np.pi*turns, 2000)
+    r = spacing * theta
+    geom["polylines"].append(np.column_stack([r*np.cos(theta), r*np.sin(theta)]))
+    return geom
+
+def mandala_geometry(layers=5, n_petals=8, radius=1.0):
+    geom = _empty_geometry()
+    circles = []
+    for layer in range(1, layers + 1):
+        r = radius * layer * 0.7
+        count = n_petals * layer
+        angle = 2 * np.pi * np.arange(count) / count
+        circles.append(np.column_stack([r*np.cos(angle), r*np.sin(angle), np.full(count, r*0.2)]))
+    if circles:
+        geom["circles"] = np.concatenate(circles)
+    max_r = radius * layers * 0.7
+    geom["bounds"] = (-max_r * 1.2, max_r * 1.2, -max_r * 1.2, max_r * 1.2)
+    return geom
+
+def lattice_geometry(rows=9, cols=9, spacing=1.0):
+    geom = _empty_geometry()
+    xs = np.arange(cols) * spacing
+    ys = np.arange(rows) * spacing
+    for x in xs:
+        geom["polylines"].append(np.array([[x, ys[0]], [x, ys[-1]]]))
+    for y in ys:
+        geom["polylines"].append(np.array([[xs[0], y], [xs[-1], y]]))
+    return geom
 
+def flower_geometry(petals=8, radius=1.0):
+    geom = _empty_geometry()
+    theta = np.linspace(0, 2*np.pi, 1000)
+    r = radius * np.sin(petals*theta)
+    geom["polylines"].append(np.column_stack([r*np.cos(theta), r*np.sin(theta)]))
+    return geom
+
+def kolam_geometry(pattern="weave",
+                   rows=9, cols=9,
+                   n_petals=8, rings=3,
+                   spacing=1.0, radius=1.5,
+                   dot_grid=True, dot_radius=0.05,
+                   weave_style="classic",
+                   fractal_depth=3, ring_scale=0.8,
+                   turns=6, layers=5, petals=8):
+    """
+    Geometry for a pattern, taking the same shape arguments as generate_kolam_image.
+    """
+    if pattern == "weave":
+        return weave_geometry(rows, cols, spacing, weave_style, dot_grid, dot_radius)
+    elif pattern == "radial":
+        return radial_geometry(n_petals, rings, radius, ring_scale)
+    elif pattern == "fractal":
+        return fractal_geometry(fractal_depth, radius)
+    elif pattern == "spiral":
+        return spiral_geometry(turns, spacing)
     elif pattern == "mandala":
-        max_r = radius * layers * 0.7   # maximum reach of mandala
-        for layer in range(1, layers + 1):
-            r = radius * layer * 0.7
-            for i in range(n_petals * layer):
-                angle = 2 * np.pi * i / (n_petals * layer)
-                x = r * np.cos(angle)
-                y = r * np.sin(angle)
-                circle = plt.Circle((x, y), r * 0.2, 
-                                    fill=False, 
-                                    color=line_color, 
-                                    linewidth=line_width)
-                ax.add_patch(circle)
+        return mandala_geometry(layers, n_petals, radius)
+    elif pattern == "lattice":
+        return lattice_geometry(rows, cols, spacing)
+    elif pattern == "flower":
+        return flower_geometry(n_petals, radius)
+    return _empty_geometry()
 
-        # ✅ Ensure mandala is fully visible
-        ax.set_xlim(-max_r * 1.2, max_r * 1.2)
-        ax.set_ylim(-max_r * 1.2, max_r * 1.2)
+# ---------------- Scenes ----------------
+# Stage one of rendering: geometry memoized on the pattern's shape
+# parameters only, so recolouring or restyling a design reuses its scene.
+SCENE_CACHE_SIZE = int(os.getenv("KOLAM_SCENE_CACHE_SIZE", 32))
 
+@functools.lru_cache(maxsize=SCENE_CACHE_SIZE)
+def _cached_scene(pattern, shape):
+    return KolamScene(pattern, shape, kolam_geometry(pattern, **dict(shape)))
 
+def kolam_scene(pattern="weave",
+                rows=9, cols=9,
+                n_petals=8, rings=3,
+                spacing=1.0, radius=1.5,
+                dot_grid=True, dot_radius=0.05,
+                weave_style="classic",
+                fractal_depth=3, ring_scale=0.8,
+                turns=6, layers=5, petals=8):
+    """
+    KolamScene for a pattern, built once per distinct shape.
+    """
+    values = dict(rows=int(rows), cols=int(cols), n_petals=int(n_petals), rings=int(rings),
+                  spacing=float(spacing), radius=float(radius),
+                  dot_grid=bool(dot_grid), dot_radius=float(dot_radius),
+                  weave_style=str(weave_style), fractal_depth=int(fractal_depth),
+                  ring_scale=float(ring_scale), turns=int(turns), layers=int(layers))
+    names = SHAPE_PARAMS.get(pattern, ())
+    if pattern == "weave" and not values["dot_grid"]:
+        names = tuple(n for n in names if n != "dot_radius")
+    return _cached_scene(pattern, tuple((n, values[n]) for n in names))
 
-    elif pattern == "lattice":
-        kolam_lattice(ax, rows=rows, cols=cols, spacing=spacing,
-                      line_color=line_color, line_width=line_width)
+def scene_cache_stats():
+    info = _cached_scene.cache_info()
+    lookups = info.hits + info.misses
+    return {"hits": info.hits, "misses": info.misses,
+            "hit_rate": info.hits / lookups if lookups else 0.0,
+            "entries": info.currsize, "max_entries": info.maxsize}
 
-    elif pattern == "flower":
-        kolam_flower(ax, petals=n_petals, radius=radius,
-                     line_color=line_color, line_width=line_width)
+def arc_polylines(arcs, samples=33):
+    """
+    Tessellate (n, 5) arc rows into an (n, samples, 2) vertex array.
+    """
+    cx, cy, r, t1, t2 = arcs.T
+    t = np.linspace(0.0, 1.0, samples)
+    theta = np.radians(t1[:, None] + arc_spans(t1, t2)[:, None] * t[None, :])
+    return np.stack([cx[:, None] + r[:, None]*np.cos(theta),
+                     cy[:, None] + r[:, None]*np.sin(theta)], axis=-1)
+
+def draw_scene(ax, scene, line_color="black", dot_color="black", line_width=1.5):
+    """
+    Add a scene to matplotlib axes as at most four collections.
+    """
+    geom = scene.geometry
+    fixed = geom["bounds"] is not None
+    if len(geom["polylines"]):
+        # Line2D defaults, so the collection draws exactly like ax.plot did
+        ax.add_collection(LineCollection(geom["polylines"], colors=line_color, linewidths=line_width,
+                                         capstyle="projecting", joinstyle="round"),
+                          autolim=not fixed)
+    if len(geom["arcs"]):
+        ax.add_collection(LineCollection(arc_polylines(geom["arcs"]), colors=line_color,
+                                         linewidths=line_width, zorder=1),
+                          autolim=not fixed)
+    for key, face, edge, width in (("circles", "none", line_color, line_width),
+                                   ("dots", dot_color, dot_color, 1.0)):
+        shapes = geom[key]
+        if len(shapes):
+            d = 2 * shapes[:, 2]
+            if (d == d[0]).all():
+                d = d[0]        # one size for all: draws exactly like draw_dot_grid's patches
+            ax.add_collection(EllipseCollection(d, d, 0, units="xy", offsets=shapes[:, :2],
+                                                offset_transform=ax.transData,
+                                                facecolors=face, edgecolors=edge,
+                                                linewidths=width),
+                              autolim=False)
+    if fixed:
+        x0, x1, y0, y1 = geom["bounds"]
+        ax.set_xlim(x0, x1)
+        ax.set_ylim(y0, y1)
+    else:
+        ax.autoscale_view()
 
+def _figure_axes(fig, bg_color):
+    if fig is None:
+        fig, ax = plt.subplots(figsize=(6,6), facecolor=bg_color)
+        return fig, ax, True
+    # Caller-owned figure (e.g. one per batch worker): reset and reuse it
+    fig.clf()
+    fig.set_facecolor(bg_color)
+    return fig, fig.add_subplot(), False
+
+def _save_figure(fig, ax, bg_color, close):
     ax.set_aspect("equal")
     ax.axis("off")
-
     buf = io.BytesIO()
-    plt.savefig(buf, format="png", bbox_inches="tight", dpi=200, facecolor=bg_color)
-    plt.close(fig)
+    fig.savefig(buf, format="png", bbox_inches="tight", dpi=200, facecolor=bg_color)
+    if close:
+        plt.close(fig)
     buf.seek(0)
     return buf
 
+def render_scene(scene, line_color="black", dot_color="black", bg_color="white",
+                 line_width=1.5, backend="matplotlib", fig=None):
+    """
+    Stage two of rendering: style and rasterize a scene to PNG (BytesIO).
+    """
+    if backend in ("raster", "tiled"):
+        # Skip matplotlib entirely: draw the geometry straight into a uint8 canvas
+        return io.BytesIO(scene.png(line_color, dot_color, bg_color, line_width))
+    fig, ax, own = _figure_axes(fig, bg_color)
+    draw_scene(ax, scene, line_color, dot_color, line_width)
+    return _save_figure(fig, ax, bg_color, own)
+
+def weave_geometry_bands(rows=9, cols=9, spacing=1.0, style="classic",
+                         dot_grid=True, dot_radius=0.05, band_rows=64):
+    """
+    Weave geometry as a sequence of horizontal bands of band_rows lattice
+    rows each. Every arc and dot appears in exactly one band.
+    """
+    bounds = (-spacing, (cols-1)*spacing + spacing, -spacing, (rows-1)*spacing + spacing)
+    for j0 in range(0, max(rows, 1), band_rows):
+        j1 = min(j0 + band_rows, rows)
+        geom = _empty_geometry()
+        i, j, t1, t2 = weave_arc_table(rows, cols, style, cells=(0, cols-1, j0, j1))
+        geom["arcs"] = np.column_stack([i*spacing + spacing/2, j*spacing + spacing/2,
+                                        np.full(len(i), spacing/2), t1, t2])
+        if dot_grid:
+            X, Y = np.meshgrid(np.arange(cols) * spacing, np.arange(j0, j1) * spacing)
+            geom["dots"] = np.column_stack([X.ravel(), Y.ravel(), np.full(X.size, dot_radius)])
+        geom["bounds"] = bounds
+        yield geom
+
+def iter_kolam_vector(output_format="svg", pattern="weave",
+                      rows=9, cols=9,
+                      n_petals=8, rings=3,
+                      spacing=1.0, radius=1.5,
+                      dot_grid=True, dot_radius=0.05,
+                      line_color="black", dot_color="black", bg_color="white",
+                      line_width=1.5, weave_style="classic",
+                      fractal_depth=3, ring_scale=0.8,
+                      turns=6, layers=5, petals=8):
+    """
+    Stream a kolam as SVG (str pieces) or PDF (bytes pieces).
+    """
+    if pattern == "weave":
+        bounds = (-spacing, (cols-1)*spacing + spacing, -spacing, (rows-1)*spacing + spacing)
+        chunks = weave_geometry_bands(rows, cols, spacing, weave_style, dot_grid, dot_radius)
+    elif pattern == "fractal":
+        # Vector files are zoomable: no pruning at raster resolution, only the segment budget
+        geom = fractal_geometry(fractal_depth, radius, pixel=0)
+        bounds = data_bounds(geom)
+        chunks = [geom]
+    else:
+        geom = kolam_scene(pattern, rows, cols, n_petals, rings, spacing, radius,
+                           dot_grid, dot_radius, weave_style,
+                           fractal_depth, ring_scale, turns, layers, petals).geometry
+        bounds = data_bounds(geom)
+        chunks = [geom]
+    writer = iter_pdf if output_format == "pdf" else iter_svg
+    return writer(chunks, bounds, line_color=line_color, dot_color=dot_color,
+                  bg_color=bg_color, line_width=line_width)
+
+# ---------------- Tiled Weave ----------------
+def render_weave_tiled(out=None, rows=9, cols=9, spacing=1.0, style="classic",
+                       dot_grid=True, dot_radius=0.05,
+                       line_color="black", dot_color="black", bg_color="white",
+                       line_width=1.5, cell_px=40, tile_px=1024):
+    """
+    Render a weave of any size at cell_px pixels per lattice step, one
+    tile_px x tile_px tile at a time, streaming rows into a PNG.
+
+    out may be a path or a binary file object; when None the PNG is returned
+    in a BytesIO. Peak memory is one band of tile_px image rows plus the
+    geometry of a single tile, independent of the grid size.
+    """
+    bounds = (-spacing, (cols-1)*spacing + spacing, -spacing, (rows-1)*spacing + spacing)
+
+    def tile_geometry(window):
+        return weave_geometry(rows, cols, spacing, style, dot_grid, dot_radius, window=window)
+
+    buf = io.BytesIO() if out is None else None
+    if isinstance(out, str):
+        with open(out, "wb") as f:
+            render_tiled(f, bounds, tile_geometry, cell_px / spacing,
+                         line_color, dot_color, bg_color, line_width, tile_px=tile_px)
+        return out
+    render_tiled(buf if out is None else out, bounds, tile_geometry, cell_px / spacing,
+                 line_color, dot_color, bg_color, line_width, tile_px=tile_px)
+    if buf is not None:
+        buf.seek(0)
+        return buf
+    return out
+
+# ---------------- API: Generate Image ----------------
+def generate_kolam_image(pattern="weave",
+                         rows=9, cols=9,
+                         n_petals=8, rings=3,
+                         spacing=1.0, radius=1.5,
+                         dot_grid=True, dot_radius=0.05,
+                         line_color="black", dot_color="black", bg_color="white",
+                         line_width=1.5, weave_style="classic",
+                         fractal_depth=3, ring_scale=0.8,
+                         turns=6, layers=5, petals=8,
+                         weave_mode="collection", backend="matplotlib",
+                         cell_px=40, tile_px=1024, out=None, output_format="png",
+                         fig=None):
+    if output_format in ("svg", "pdf"):
+        pieces = iter_kolam_vector(output_format, pattern, rows, cols, n_petals, rings,
+                                   spacing, radius, dot_grid, dot_radius,
+                                   line_color, dot_color, bg_color, line_width, weave_style,
+                                   fractal_depth, ring_scale, turns, layers, petals)
+        buf = io.BytesIO()
+        for piece in pieces:
+            buf.write(piece.encode("utf-8") if isinstance(piece, str) else piece)
+        buf.seek(0)
+        return buf
+
+    if backend == "tiled" and pattern == "weave":
+        # Bounded-memory path for huge grids: fixed pixels per lattice step,
+        # rendered tile by tile and streamed into the PNG
+        return render_weave_tiled(out, rows, cols, spacing, weave_style, dot_grid, dot_radius,
+                                  line_color, dot_color, bg_color, line_width, cell_px, tile_px)
+
+    if pattern == "weave" and weave_mode == "patches" and backend == "matplotlib":
+        # The original one-patch-per-arc path, kept for comparison
+        fig, ax, own = _figure_axes(fig, bg_color)
+        kolam_weave(ax, rows, cols, spacing, line_color, line_width, weave_style)
+        if dot_grid:
+            draw_dot_grid(ax, rows, cols, spacing, dot_radius, dot_color)
+        return _save_figure(fig, ax, bg_color, own)
+
+    scene = kolam_scene(pattern, rows, cols, n_petals, rings, spacing, radius,
+                        dot_grid, dot_radius, weave_style,
+                        fractal_depth, ring_scale, turns, layers, petals)
+    return render_scene(scene, line_color, dot_color, bg_color, line_width, backend, fig)
+
@@ -0,0 +1,19 @@
+import numpy as np
+
+from kolam.analysis import classify_kolam_density
+
+SPARSE = {"dot_density": 1e-4, "skeleton_density": 1e-3, "loop_density": 5e-3}
+
+
+def test_loops_ignored_until_calibrated():
+    assert classify_kolam_density(SPARSE) == "Simple Dot-Based"
+
+
+def test_loop_threshold_override():
+    assert classify_kolam_density(SPARSE, {"complex_loop_density": 1e-3}) == "Complex/Looped"
+
+
+def test_columns():
+    columns = {"dot_density": np.array([1e-4, 1e-3, 1.0]),
+               "skeleton_density": np.array([1e-3, 5e-3, 1.0])}
+    assert classify_kolam_density(columns).tolist() == ["Simple Dot-Based", "Geometric", "Complex/Looped"]
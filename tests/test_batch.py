@@ -0,0 +1,11 @@
+from kolam.batch import run_sweep
+
+
+def test_skipped_counts_only_this_spec(tmp_path):
+    first = {"base": {"pattern": "lattice"}, "sweep": {"rows": [3, 4]}}
+    second = {"base": {"pattern": "lattice"}, "sweep": {"rows": [4, 5]}}
+    assert run_sweep(first, str(tmp_path), workers=1)["rendered"] == 2
+
+    summary = run_sweep(second, str(tmp_path), workers=1)
+    assert summary["rendered"] == 1
+    assert summary["skipped"] == 1
@@ -0,0 +1,26 @@
+import os
+
+from kolam.cache import TMP_SUFFIX, LRUCache
+
+
+def test_trim_skips_in_flight_temp_files(tmp_path):
+    cache = LRUCache(max_bytes=0, disk_dir=str(tmp_path), disk_max_bytes=10)
+    partial = tmp_path / "ab" / ("x" + TMP_SUFFIX)
+    partial.parent.mkdir()
+    partial.write_bytes(b"0" * 100)
+    cache.put("ab" + "0" * 62, b"1" * 8)
+    cache.put("ab" + "1" * 62, b"2" * 8)
+    assert partial.exists()
+    assert len(os.listdir(partial.parent)) == 2
+
+
+def test_disk_get_survives_concurrent_trim(tmp_path, monkeypatch):
+    cache = LRUCache(max_bytes=0, disk_dir=str(tmp_path))
+    key = "cd" + "0" * 62
+    cache.put(key, b"value")
+
+    def trimmed(path, *args, **kwargs):
+        os.remove(path)
+        raise FileNotFoundError(path)
+    monkeypatch.setattr(os, "utime", trimmed)
+    assert cache.get(key) == b"value"
@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+from kolam.analysis import FEATURES_VERSION
+from kolam.classifier import (StaleModelError, get_model, load_model, predict, save_model,
+                              train_model)
+
+
+def small_model(features_version):
+    rng = np.random.default_rng(0)
+    X = np.concatenate([rng.normal(0, 1, (20, 2)), rng.normal(5, 1, (20, 2))])
+    y = ["pulli"] * 20 + ["sikku"] * 20
+    model = train_model(X, y, ["a", "b"])
+    model["info"]["store_settings"] = {"features_version": features_version}
+    return model, X, y
+
+
+def test_round_trip(tmp_path):
+    model, X, y = small_model(FEATURES_VERSION)
+    path = str(tmp_path / "model.npz")
+    save_model(model, path)
+    assert predict(load_model(path), X).tolist() == y
+
+
+def test_stale_features_version(tmp_path):
+    path = str(tmp_path / "model.npz")
+    save_model(small_model(FEATURES_VERSION - 1)[0], path)
+    with pytest.raises(StaleModelError):
+        load_model(path)
+    with pytest.warns(UserWarning, match="density thresholds"):
+        assert get_model(path) is None
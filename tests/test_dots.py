@@ -0,0 +1,19 @@
+import json
+import math
+
+from kolam.dots import dot_stats
+
+
+def test_grid_lattice():
+    stats = dot_stats([(x * 10, y * 10) for x in range(5) for y in range(5)])
+    assert stats["lattice_pitch"] == 10
+    assert stats["lattice_order"] > 0.99
+
+
+def test_no_lattice_spacing():
+    # Nearest distances 1, 1, 10, 10: their median, 5.5, matches none of them
+    stats = dot_stats([(0, 0), (1, 0), (100, 0), (110, 0)])
+    assert all(math.isfinite(v) for v in stats.values())
+    assert stats["lattice_pitch"] == stats["dot_nn_median"]
+    assert stats["local_density_mean"] >= 0
+    json.dumps(stats, allow_nan=False)
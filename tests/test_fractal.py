@@ -0,0 +1,18 @@
+import pytest
+
+from kolam.fractal import FractalBudgetError, fractal_levels, fractal_squares
+
+
+def test_raster_prunes_sub_pixel_levels():
+    assert fractal_levels(11, 1.5) < 12
+
+
+def test_unpruned_keeps_every_level():
+    x, _, s = fractal_squares(9, 1.5, pixel=0, max_segments=0)
+    assert len(x) == (4 ** 10 - 1) // 3
+    assert s.min() == 1.5 / 2 ** 9
+
+
+def test_unpruned_still_budgeted():
+    with pytest.raises(FractalBudgetError):
+        fractal_squares(9, 1.5, pixel=0, max_segments=400_000)
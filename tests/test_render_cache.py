@@ -0,0 +1,14 @@
+from kolam import render_cache
+from kolam.render_cache import normalize_render_params, render_key
+
+
+def test_key_ignores_unused_params():
+    assert render_key(normalize_render_params({"pattern": "radial", "rows": 3})) == \
+        render_key(normalize_render_params({"pattern": "radial", "rows": 11}))
+
+
+def test_key_changes_with_render_version(monkeypatch):
+    params = normalize_render_params({})
+    before = render_key(params)
+    monkeypatch.setattr(render_cache, "RENDER_VERSION", render_cache.RENDER_VERSION + 1)
+    assert render_key(params) != before
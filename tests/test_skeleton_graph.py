@@ -0,0 +1,69 @@
+import cv2
+import numpy as np
+import pytest
+from skimage.morphology import skeletonize
+
+from kolam.skeleton_graph import ENDPOINT, JUNCTION, LOOP, graph_features, skeleton_graph
+
+
+def skeleton_of(draw):
+    img = np.zeros((200, 200), np.uint8)
+    draw(img)
+    return skeletonize(img > 0)
+
+
+def line(img):
+    cv2.line(img, (20, 100), (180, 100), 255, 5)
+
+
+def circle(img):
+    cv2.circle(img, (100, 100), 60, 255, 5)
+
+
+def figure_eight(img):
+    cv2.circle(img, (100, 60), 40, 255, 5)
+    cv2.circle(img, (100, 140), 40, 255, 5)
+
+
+def grid(img):
+    # 3 x 3 lines: 4 cells, 4 T junctions and a crossing
+    for k in range(3):
+        cv2.line(img, (40, 40 + 60 * k), (160, 40 + 60 * k), 255, 5)
+        cv2.line(img, (40 + 60 * k, 40), (40 + 60 * k, 160), 255, 5)
+
+
+@pytest.mark.parametrize("draw, loops, junctions, endpoints, edges", [
+    (line, 0, 0, 2, 1),
+    (circle, 1, 0, 0, 1),
+    (figure_eight, 2, 2, 0, 3),
+    (grid, 4, 5, 0, 8),
+])
+def test_shapes(draw, loops, junctions, endpoints, edges):
+    graph = skeleton_graph(skeleton_of(draw))
+    features = graph_features(graph)
+    assert graph["components"] == 1
+    assert features["graph_loops"] == loops
+    assert features["graph_junctions"] == junctions
+    assert features["graph_endpoints"] == endpoints
+    assert features["graph_edges"] == edges
+
+
+def test_line_length_and_kinds():
+    img = np.zeros((50, 200), np.uint8)
+    cv2.line(img, (20, 25), (180, 25), 255, 1)
+    graph = skeleton_graph(img > 0)
+    assert sorted(graph["node_kind"]) == [ENDPOINT, ENDPOINT]
+    assert graph["edge_length"].tolist() == [160.0]
+
+
+def test_bare_loop_gets_anchor_node():
+    graph = skeleton_graph(skeleton_of(circle))
+    assert graph["node_kind"].tolist() == [LOOP]
+    assert graph["edges"].tolist() == [[0, 0]]
+    assert graph["node_degree"].tolist() == [2]
+
+
+def test_empty():
+    features = graph_features(skeleton_graph(np.zeros((10, 10), bool)))
+    assert features["graph_loops"] == 0 and features["graph_edges"] == 0
+    assert JUNCTION not in skeleton_graph(np.zeros((10, 10), bool))["node_kind"]
@@ -0,0 +1,23 @@
+import numpy as np
+import pytest
+
+from kolam.weave import WeaveRule, register_weave_style, weave_styles
+
+
+def test_rule_matches_per_cell_calls():
+    rule = WeaveRule(on="i+j", cases=[[(0, 90)], [(90, 180), (270, 360)], []], rotate=("i", 30))
+    I, J = np.meshgrid(np.arange(4), np.arange(3), indexing="ij")
+    cell, t1, t2 = rule.arcs(I.ravel(), J.ravel())
+    expected = [(n, a, b) for n, (i, j) in enumerate(zip(I.ravel(), J.ravel())) for a, b in rule(i, j)]
+    assert list(zip(cell.tolist(), t1.tolist(), t2.tolist())) == expected
+
+
+def test_no_cases_rejected_with_style_name():
+    with pytest.raises(ValueError, match="'empty'"):
+        register_weave_style("empty", on="i", cases=[])
+    assert "empty" not in weave_styles
+
+
+def test_no_cases_with_mod_draws_nothing():
+    cell, _, _ = WeaveRule(cases=[], mod=2).arcs(np.arange(3), np.arange(3))
+    assert len(cell) == 0